@@ -0,0 +1,53 @@
+"""
+PorterStemmer with and without the stem cache on a headline corpus.
+
+Run from the repository root: python -m benchmarks.bench_porter
+"""
+from __future__ import division
+import threading
+import timeit
+
+import porter
+from benchmarks.corpus import headlines, words
+
+
+def bench_porter(n=20000, repeat=3, cache_size=50000, threads=4):
+    tokens = words(headlines(n))
+
+    plain = porter.PorterStemmer()
+    uncached = min(timeit.repeat(lambda: [plain.stem(w) for w in tokens],
+                                 number=1, repeat=repeat))
+
+    stemmer = porter.PorterStemmer(cache_size=cache_size)
+
+    def cached_run():
+        stemmer.cache_clear()
+        return [stemmer.stem(w) for w in tokens]
+    cached = min(timeit.repeat(cached_run, number=1, repeat=repeat))
+    info = stemmer.cache_info()
+
+    # one shared cached stemmer serving several threads
+    def threaded_run():
+        stemmer.cache_clear()
+        chunks = [tokens[i::threads] for i in range(threads)]
+        workers = [threading.Thread(target=lambda c=c: [stemmer.stem(w)
+                                                        for w in c])
+                   for c in chunks]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    shared = min(timeit.repeat(threaded_run, number=1, repeat=repeat))
+
+    return {
+        'words': len(tokens),
+        'uncached_words_per_sec': len(tokens) / uncached,
+        'cached_words_per_sec': len(tokens) / cached,
+        'threaded_cached_words_per_sec': len(tokens) / shared,
+        'cache_hit_rate': info.hits / (info.hits + info.misses),
+    }
+
+
+if __name__ == '__main__':
+    for name, value in sorted(bench_porter().items()):
+        print('%s: %s' % (name, value))
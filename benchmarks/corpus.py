@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Deterministic synthetic corpora for the benchmarks.
+
+headlines() mimics financial news headlines: a small set of companies,
+verbs and events recombined, so words repeat the way they do in a real
+feed. language_words() glues common stems and inflections of a language
+together, which is enough to drive every branch of its stemmer.
+afinn_words() and model_terms() read the word lists bundled with the
+repository.
+"""
+import io
+import os
+import random
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPANIES = [
+    'Apple', 'Microsoft', 'Yahoo', 'Google', 'Amazon', 'Intel', 'Tesla',
+    'Facebook', 'Netflix', 'IBM', 'Oracle', 'Cisco', 'Boeing', 'Ford',
+    'General Motors', 'Walmart', 'Exxon', 'Chevron', 'Pfizer', 'Merck',
+    'JPMorgan', 'Goldman Sachs', 'Citigroup', 'Wells Fargo', 'TSMC',
+]
+SUBJECTS = [
+    'shares', 'stock', 'profit', 'revenue', 'earnings', 'sales',
+    'outlook', 'margins', 'guidance', 'dividend', 'investors', 'analysts',
+]
+VERBS = [
+    'jumps', 'falls', 'surges', 'slides', 'rallies', 'tumbles', 'climbs',
+    'drops', 'beats estimates', 'misses forecasts', 'disappoints',
+    'soars', 'plunges', 'rebounds', 'stalls', 'improves', 'weakens',
+]
+EVENTS = [
+    'after quarterly results', 'on strong demand', 'amid layoffs',
+    'as rates rise', 'on merger talks', 'after CEO resigns',
+    'on weak guidance', 'ahead of earnings', 'amid trade worries',
+    'after upgrade', 'after downgrade', 'on record iPhone sales',
+    'as regulators investigate', 'on buyback plans', 'amid lawsuit',
+    'as markets recover', 'on disappointing forecasts', 'in early trading',
+]
+TEMPLATES = [
+    '{company} {subject} {verb} {event}',
+    '{company} {subject} {verb} {pct}% {event}',
+    'Why {company} {subject} {verb} today',
+    '{company} {verb} {event}; {other} {subject} {verb2}',
+    'Analysts say {company} {subject} {verb} {event}',
+]
+
+
+def headlines(n=10000, seed=0):
+    """Return n headline strings, the same ones for the same seed."""
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(n):
+        result.append(rnd.choice(TEMPLATES).format(
+            company=rnd.choice(COMPANIES),
+            other=rnd.choice(COMPANIES),
+            subject=rnd.choice(SUBJECTS),
+            verb=rnd.choice(VERBS),
+            verb2=rnd.choice(VERBS),
+            event=rnd.choice(EVENTS),
+            pct=rnd.randint(1, 30)))
+    return result
+
+
+def words(texts):
+    """Split texts into lower-case word tokens."""
+    return [w.strip(',.;%').lower() for t in texts for w in t.split()]
+
+
+# (stems, endings) per language, used by language_words()
+LANGUAGES = {
+    'danish': ([u'bil', u'hus', u'kvinde', u'arbejd', u'bøg', u'købmand'],
+               [u'', u'en', u'erne', u'ene', u'ede', u'else', u'hed', u'elig']),
+    'dutch': ([u'huis', u'boek', u'werk', u'kind', u'lopen', u'mooi'],
+              [u'', u'en', u'heden', u'ing', u'lijk', u'baar', u'je', u'ste']),
+    'english': ([u'connect', u'generous', u'happi', u'nation', u'run', u'stock'],
+                [u'', u's', u'ing', u'ed', u'ational', u'ness', u'fully', u'ly']),
+    'finnish': ([u'talo', u'kirja', u'käsi', u'pöytä', u'auto', u'kaupunki'],
+                [u'', u'ssa', u'lla', u'sta', u'ksi', u'ni', u'mme', u'ineen']),
+    'french': ([u'nation', u'continu', u'heureu', u'chant', u'grand', u'porte'],
+               [u'', u'ement', u'ations', u'euse', u'ité', u'aient', u'ons', u'ées']),
+    'german': ([u'haus', u'arbeit', u'schön', u'kauf', u'zeit', u'mensch'],
+               [u'', u'en', u'ern', u'lich', u'heit', u'ung', u'keit', u'isch']),
+    'hungarian': ([u'ház', u'könyv', u'város', u'ember', u'kert', u'asztal'],
+                  [u'', u'ban', u'nak', u'okat', u'ról', u'ként', u'ekkel', u'ait']),
+    'italian': ([u'cas', u'parl', u'bell', u'giorn', u'nazion', u'continu'],
+                [u'', u'are', u'ando', u'ezza', u'amente', u'ale', u'ione', u'issimo']),
+    'norwegian': ([u'bil', u'hus', u'jente', u'arbeid', u'skole', u'båt'],
+                  [u'', u'en', u'ene', u'ede', u'het', u'elig', u'ert', u'slov']),
+    'porter': ([u'connect', u'generous', u'happi', u'nation', u'run', u'stock'],
+               [u'', u's', u'ing', u'ed', u'ational', u'ness', u'fully', u'ly']),
+    'portuguese': ([u'cas', u'livr', u'menin', u'nacion', u'cant', u'feliz'],
+                   [u'', u'as', u'inho', u'mente', u'ões', u'idade', u'ava', u'ção']),
+    'romanian': ([u'cas', u'cart', u'frumos', u'lucr', u'oraș', u'națion'],
+                 [u'', u'ele', u'ilor', u'ească', u'ător', u'iune', u'ând', u'ul']),
+    'russian': ([u'книг', u'город', u'работ', u'красив', u'дом', u'говор'],
+                [u'', u'ами', u'ость', u'ый', u'ения', u'ился', u'ов', u'ешь']),
+    'spanish': ([u'cas', u'libr', u'nacion', u'cant', u'feliz', u'trabaj'],
+                [u'', u'es', u'amiento', u'idad', u'ando', u'mente', u'aron', u'ísimo']),
+    'swedish': ([u'bil', u'hus', u'flicka', u'arbet', u'skola', u'båt'],
+                [u'', u'en', u'arna', u'ande', u'het', u'lig', u'ast', u'else']),
+    'arabic': ([u'كتب', u'درس', u'علم', u'عمل', u'سوق', u'بنك'],
+               [u'', u'ون', u'ات', u'ين', u'ها', u'هم', u'ة', u'كما']),
+}
+
+# prefixes for languages that inflect at the front as well
+PREFIXES = {
+    'arabic': [u'', u'ال', u'وال', u'بال', u'لل', u'ي', u'ت', u'م'],
+}
+
+
+def language_words(language, n=20000, seed=0):
+    """Return n words of language built from LANGUAGES and PREFIXES."""
+    stems, endings = LANGUAGES[language]
+    prefixes = PREFIXES.get(language, [u''])
+    rnd = random.Random(seed)
+    return [rnd.choice(prefixes) + rnd.choice(stems) + rnd.choice(endings)
+            for _ in range(n)]
+
+
+def afinn_words():
+    """Words of the bundled AFINN-111 sentiment lexicon."""
+    with io.open(os.path.join(ROOT, 'AFINN-111.txt'), encoding='utf-8') as f:
+        return [line.split(u'\t')[0] for line in f if line.strip()]
+
+
+def model_terms():
+    """Vocabulary of the bundled model.file, in file order."""
+    with io.open(os.path.join(ROOT, 'model.file'), 'rb') as f:
+        f.readline()
+        return [line.split()[0] for line in f if line.strip()]
@@ -0,0 +1,289 @@
+"""
+Benchmark suite for the sentiment and stemming hot paths.
+
+Run from the repository root with Python 2, like the stemmers:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --compare before.json --output after.json
+    python -m benchmarks.run lancaster.stem snowball.german
+
+Every benchmark runs in its own process on a fixed corpus from
+benchmarks.corpus and reports ops/sec (best of --repeat runs) and the
+peak memory of one run on top of its setup. Benchmarks whose module
+cannot be imported here, such as the stemmers that need NLTK data, are
+reported as skipped. With --compare, a benchmark that got slower than
+the baseline by more than --threshold makes the command exit with 1.
+"""
+from __future__ import division
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from collections import OrderedDict
+
+from benchmarks import corpus
+
+# same tuple as snowball.SnowballStemmer.languages
+SNOWBALL_LANGUAGES = ("danish", "dutch", "english", "finnish", "french",
+                      "german", "hungarian", "italian", "norwegian", "porter",
+                      "portuguese", "romanian", "russian", "spanish", "swedish")
+
+# errors that mean "cannot run here" rather than "broken"
+UNAVAILABLE = (ImportError, IOError, OSError, LookupError)
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    """
+    Register a setup function under name. The setup returns (run, ops),
+    where run() does the measured work once and ops is how many
+    operations one run performs.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _stem_all(stemmer, words):
+    stem = stemmer.stem
+    return lambda: [stem(w) for w in words]
+
+
+@benchmark('porter.stem')
+def bench_porter_stem():
+    import porter
+    words = corpus.words(corpus.headlines(5000))
+    return _stem_all(porter.PorterStemmer(), words), len(words)
+
+
+@benchmark('porter.stem_cached')
+def bench_porter_stem_cached():
+    import porter
+    words = corpus.words(corpus.headlines(5000))
+    stemmer = porter.PorterStemmer(cache_size=50000)
+
+    def run():
+        stemmer.cache_clear()
+        return [stemmer.stem(w) for w in words]
+    return run, len(words)
+
+
+def _register_snowball(language):
+    @benchmark('snowball.' + language)
+    def bench_snowball():
+        import snowball
+        words = corpus.language_words(language, 5000)
+        return _stem_all(snowball.SnowballStemmer(language), words), len(words)
+
+for _language in SNOWBALL_LANGUAGES:
+    _register_snowball(_language)
+
+
+@benchmark('lancaster.stem')
+def bench_lancaster_stem():
+    import lancaster
+    words = corpus.words(corpus.headlines(2000)) + corpus.afinn_words()
+    return _stem_all(lancaster.LancasterStemmer(), words), len(words)
+
+
+@benchmark('isri.stem')
+def bench_isri_stem():
+    import isri
+    words = corpus.language_words('arabic', 5000)
+    return _stem_all(isri.ISRIStemmer(), words), len(words)
+
+
+@benchmark('rslp.stem')
+def bench_rslp_stem():
+    import rslp
+    words = corpus.language_words('portuguese', 5000)
+    return _stem_all(rslp.RSLPStemmer(), words), len(words)
+
+
+@benchmark('sentiment.getSentiment')
+def bench_get_sentiment():
+    import ra2616Test
+    texts = corpus.headlines(1000)
+    ra2616Test.get_model()
+    return lambda: [ra2616Test.getSentiment(t) for t in texts], len(texts)
+
+
+@benchmark('sentiment.score_batch')
+def bench_score_batch():
+    import ra2616Test
+    texts = corpus.headlines(1000)
+    ra2616Test.get_model()
+    return lambda: ra2616Test.score_batch(texts), len(texts)
+
+
+@benchmark('document.scoreTweet')
+def bench_document_score_tweet():
+    from document import Document
+    texts = corpus.headlines(1000)
+    model = Document()
+    model.loadPriorParameters(os.path.join(corpus.ROOT, 'model.file'))
+    return lambda: [model.scoreTweet(t) for t in texts], len(texts)
+
+
+@benchmark('document.loadPriorParameters')
+def bench_document_load():
+    from document import Document
+    filename = os.path.join(corpus.ROOT, 'model.file')
+    return lambda: Document().loadPriorParameters(filename), 1
+
+
+@benchmark('document.loadCompiledParameters')
+def bench_document_load_compiled():
+    from document import Document
+    import compiled_model
+    filename = os.path.join(corpus.ROOT, compiled_model.compiledFile)
+    compiled_model.CompiledModel(filename)
+    return lambda: Document().loadCompiledParameters(filename), 1
+
+
+def _peak_kb(run):
+    """Peak memory of one run() in KB, on top of what was already used."""
+    try:
+        import tracemalloc
+    except ImportError:
+        # Python 2: the process high-water mark is the best there is
+        import resource
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        run()
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(name, repeat, conn):
+    try:
+        run, ops = BENCHMARKS[name]()
+    except UNAVAILABLE as e:
+        conn.send({'skipped': '%s: %s' % (type(e).__name__, e)})
+        return
+    peak_kb = _peak_kb(run)
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    conn.send({'ops': ops,
+               'seconds': seconds,
+               'ops_per_sec': ops / seconds,
+               'peak_kb': peak_kb})
+
+
+def run_benchmark(name, repeat=3):
+    """Run one benchmark in a fresh process and return its result dict."""
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_measure,
+                                      args=(name, repeat, child))
+    process.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {'error': 'benchmark process exited with %s'
+                           % process.exitcode}
+    process.join()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(names=None, repeat=3):
+    """Run the named benchmarks (default: all) and return the report."""
+    results = OrderedDict()
+    for name in names or BENCHMARKS:
+        results[name] = run_benchmark(name, repeat)
+    return OrderedDict([
+        ('commit', _commit()),
+        ('time', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('python', platform.python_version()),
+        ('results', results),
+    ])
+
+
+def compare(baseline, report, threshold=0.1):
+    """
+    Return (name, baseline ops/sec, current ops/sec) for every benchmark
+    that is slower than in baseline by more than threshold.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name, {})
+        if 'ops_per_sec' not in result or 'ops_per_sec' not in before:
+            continue
+        if result['ops_per_sec'] < before['ops_per_sec'] * (1 - threshold):
+            regressions.append(
+                (name, before['ops_per_sec'], result['ops_per_sec']))
+    return regressions
+
+
+def print_report(report, baseline=None, out=sys.stdout):
+    for name, result in report['results'].items():
+        if 'ops_per_sec' not in result:
+            out.write('%-32s %s\n' % (name, result.get('skipped') or
+                                      result.get('error')))
+            continue
+        line = '%-32s %12.1f ops/sec %10.0f KB peak' % (
+            name, result['ops_per_sec'], result['peak_kb'])
+        before = (baseline or {}).get('results', {}).get(name, {})
+        if 'ops_per_sec' in before:
+            line += ' %+7.1f%%' % (
+                100 * (result['ops_per_sec'] / before['ops_per_sec'] - 1))
+        out.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('names', nargs='*',
+                        help='benchmarks to run, default all: %s'
+                             % ', '.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed slowdown before failing, default 0.1')
+    args = parser.parse_args(argv)
+
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: %s' % ', '.join(unknown))
+
+    report = run_all(args.names, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(baseline, report, args.threshold)
+        for name, before, after in regressions:
+            sys.stdout.write('REGRESSION %s: %.1f -> %.1f ops/sec\n'
+                             % (name, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Compile model.file and model.json into one binary, memory-mappable file.
+
+Layout (little endian, every section 8-byte aligned):
+
+    header      magic, c1Prob, c0Prob, number of features, number of terms
+    model.json  offsets int64[n+1], utf-8 string table,
+                prob, log(prob), log(1-prob) float64[n][2]
+    model.file  offsets int64[m+1], string table,
+                prob, log(prob), log(1-prob) float64[m][2]
+
+Column c of the model.file arrays holds the conditional probability of
+the term for class c. The loader maps the file and reads the arrays with
+numpy.frombuffer, so loading costs no parsing and every process using
+the model shares the same pages.
+
+Usage: python compiled_model.py [model.file] [model.json] [model.bin]
+"""
+from __future__ import division
+import io
+import json
+import mmap
+import struct
+import sys
+import numpy as np
+
+MAGIC = b'NBMODEL1'
+HEADER = struct.Struct('<8sddqq')
+
+modelFile = 'model.file'
+jsonFile = 'model.json'
+compiledFile = 'model.bin'
+
+
+def _pad(size):
+    return (-size) % 8
+
+
+def _write_section(out, terms, prob):
+    encoded = [t if isinstance(t, bytes) else t.encode('utf-8')
+               for t in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+    offsets[1:] = np.cumsum([len(t) for t in encoded])
+    table = b''.join(encoded)
+    prob = np.asarray(prob, dtype='<f8').reshape(-1, 2)
+    out.write(offsets.tobytes())
+    out.write(table + b'\0' * _pad(len(table)))
+    out.write(prob.tobytes())
+    out.write(np.log(prob).tobytes())
+    out.write(np.log(1 - prob).tobytes())
+
+
+def read_model_file(filename=modelFile):
+    """
+    Parse model.file like Document.loadPriorParameters does.
+
+    Returns (c1Prob, c0Prob, terms, prob) with terms in first-seen order.
+    """
+    with open(filename, 'rb') as f:
+        parameters = f.readline().split()
+        c1Prob = float(parameters[0])
+        c0Prob = float(parameters[1])
+        index = {}
+        rows = []
+        for line in f:
+            parameters = line.split()
+            if not parameters:
+                break
+            term = parameters[0]
+            if term not in index:
+                index[term] = len(rows)
+                rows.append([None, None])
+            rows[index[term]][int(parameters[1])] = float(parameters[2])
+    terms = sorted(index, key=index.get)
+    for term, row in zip(terms, rows):
+        if None in row:
+            raise ValueError('%r has no probability for class %d'
+                             % (term, row.index(None)))
+    return c1Prob, c0Prob, terms, rows
+
+
+def compile_model(model_file=modelFile, json_file=jsonFile,
+                  output=compiledFile):
+    """Write the binary model built from model_file and json_file."""
+    with open(json_file, 'r') as fp:
+        prob, sorted_features = json.load(fp)
+    c1Prob, c0Prob, terms, cond = read_model_file(model_file)
+
+    with io.open(output, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, c1Prob, c0Prob,
+                              len(sorted_features), len(terms)))
+        _write_section(out, sorted_features, prob)
+        _write_section(out, terms, cond)
+
+
+class _Section(object):
+    """Strings and probability arrays of one model, backed by the map."""
+
+    def __init__(self, buf, offset, count):
+        self.count = count
+        self.offsets = np.frombuffer(buf, dtype='<i8', count=count + 1,
+                                     offset=offset)
+        offset += self.offsets.nbytes
+        self._buf = buf
+        self._table = offset
+        size = int(self.offsets[-1])
+        offset += size + _pad(size)
+        arrays = []
+        for _ in range(3):
+            arrays.append(np.frombuffer(buf, dtype='<f8', count=2 * count,
+                                        offset=offset).reshape(count, 2))
+            offset += 16 * count
+        self.prob, self.log_p, self.log_q = arrays
+        self.end = offset
+
+    def terms(self):
+        """Return the raw (utf-8 encoded) strings of the section."""
+        buf = self._buf
+        start = self._table
+        bounds = (self.offsets + start).tolist()
+        return [buf[bounds[i]:bounds[i + 1]] for i in range(self.count)]
+
+
+class CompiledModel(object):
+    """
+    Read-only view of a compiled model.
+
+    features/feature_* come from model.json (SentimentModel),
+    terms/term_* and the class priors from model.file (Document).
+    """
+
+    def __init__(self, filename=compiledFile):
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.c1Prob, self.c0Prob, n, m = HEADER.unpack_from(
+            self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a compiled model' % filename)
+        self._features = _Section(self._map, HEADER.size, n)
+        self._terms = _Section(self._map, self._features.end, m)
+
+        self.feature_prob = self._features.prob
+        self.feature_log_p = self._features.log_p
+        self.feature_log_q = self._features.log_q
+        self.term_prob = self._terms.prob
+        self.term_log_p = self._terms.log_p
+        self.term_log_q = self._terms.log_q
+
+    def features(self):
+        """model.json features, decoded like json.load would."""
+        return [t.decode('utf-8') for t in self._features.terms()]
+
+    def terms(self):
+        """model.file terms as the byte strings found in the file."""
+        return self._terms.terms()
+
+
+if __name__ == '__main__':
+    compile_model(*sys.argv[1:4])
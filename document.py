@@ -0,0 +1,170 @@
+"""
+Naive Bayes tweet classifier used by hellocloud.returnSentiment.
+
+The model comes from model.file, or from model.bin when it has been
+built with compiled_model.py since model.file last changed. get_document()
+loads it once per process, scoring a tweet then costs O(|tweet|).
+"""
+from __future__ import division
+import os
+import re
+
+import compiled_model
+
+priorParamFile = 'model.file'
+
+
+class Document :
+    def __init__(self) :
+        self.vocabulary = []
+        self.c1Prob = 0.0
+        self.c0Prob = 0.0
+        self.condProb = {}
+
+    def removeStopwords(self, tokens) :
+        pattern = '^[0-9]+$'
+        stopwords = ['rt','amp','i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers', 'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now', '']
+        
+        noStopwordsText = []
+        for word in tokens :
+                if word in stopwords or word[:4] == 'http' or re.match(pattern,word) or re.match('@',word):
+                        noStopwordsText.append('')
+                else: 
+                        noStopwordsText.append(word)
+                
+        noStopwordsText = filter(None, noStopwordsText)
+        return noStopwordsText
+    
+    def loadPriorParameters(self,priorParamFile) :
+        inputFile = open(priorParamFile,"rb")
+        line = inputFile.readline().strip()
+        
+        parameters = line.split()
+        
+        self.c1Prob = float(parameters[0])
+        self.c0Prob = float(parameters[1])
+        
+        line = inputFile.readline().strip()
+        
+        while line :
+                parameters = line.split()
+                self.condProb[(parameters[0], int(parameters[1]))] = float(parameters[2])
+                self.vocabulary.append(parameters[0])
+                
+                line = inputFile.readline().strip()
+        
+        self.vocabulary = list(set(self.vocabulary))
+        self.prepareScores([[self.condProb[(eachTerm,0)], self.condProb[(eachTerm,1)]] for eachTerm in self.vocabulary])
+        
+    def loadCompiledParameters(self,compiledFile) :
+        #memory-mapped output of compiled_model.py, no text parsing
+        model = compiled_model.CompiledModel(compiledFile)
+        
+        self.c1Prob = model.c1Prob
+        self.c0Prob = model.c0Prob
+        self.vocabulary = model.terms()
+        
+        self.termProb = model.term_prob.tolist()
+        self.termIndex = dict(zip(self.vocabulary, range(len(self.vocabulary))))
+        self.absentScore = model.term_log_q.sum(axis=0).tolist()
+        self.presentDelta = (model.term_log_p - model.term_log_q).tolist()
+        
+    def prepareScores(self, termProb) :
+        #score of a tweet with no vocabulary term in it, per class,
+        #and what each term adds to it when present
+        import math
+        
+        self.termProb = termProb
+        self.termIndex = {}
+        self.absentScore = [0.0, 0.0]
+        self.presentDelta = []
+        for i in range(len(self.vocabulary)) :
+                self.termIndex[self.vocabulary[i]] = i
+                delta = []
+                for c1 in range(0,2) :
+                        absent = math.log(1.0 - termProb[i][c1])
+                        self.absentScore[c1] = self.absentScore[c1] + absent
+                        delta.append(math.log(termProb[i][c1]) - absent)
+                self.presentDelta.append(delta)
+        
+    def testModel(self, tweet) :
+        import math
+        
+        present = set()
+        for eachWord in tweet :
+                if eachWord in self.termIndex :
+                        present.add(self.termIndex[eachWord])
+        score = []
+        for c1 in range(0,2) :
+                if c1 == 0 :
+                        priorProb = self.c0Prob
+                else :
+                        priorProb = self.c1Prob
+                score.append(math.log(priorProb) + self.absentScore[c1])
+                
+                for i in present :
+                        score[c1] = score[c1] + self.presentDelta[i][c1]
+        
+        #summation order differs from fullScan, settle near ties with it
+        if abs(score[1] - score[0]) < 1e-9 :
+                return self.fullScan(present)
+        
+        if score[1] > score[0] :
+                return '1'
+        return '0'
+        
+    def fullScan(self, present) :
+        #the original O(|V|) scorer, term by term in vocabulary order
+        import math
+        
+        score = []
+        maxScore = float('-inf')
+        maxLabel = ' '
+        for c1 in range(0,2) :
+                if c1 == 0 :
+                        priorProb = self.c0Prob
+                else :
+                        priorProb = self.c1Prob
+                score.append(math.log(priorProb))
+
+                for i in range(len(self.vocabulary)) :
+                        if i in present :
+                                score[c1] = score[c1] + math.log(self.termProb[i][c1])
+                                
+                        else :
+                                score[c1] = score[c1] + math.log(1.0 - self.termProb[i][c1])
+
+                
+                if score[c1] > maxScore :
+                        maxScore = score[c1]
+                        maxLabel = str(c1)
+        
+        
+        return maxLabel
+
+    def scoreTweet(self, testTweet):
+        testTweet = self.removeStopwords(testTweet.split())
+
+        label = self.testModel(testTweet)
+        return label
+
+
+_document = None
+
+def load_document(filename=priorParamFile,
+                  compiled=compiled_model.compiledFile):
+    """Load from the compiled model when it is up to date, else filename."""
+    document = Document()
+    if (os.path.exists(compiled) and
+            os.path.getmtime(compiled) >= os.path.getmtime(filename)):
+        document.loadCompiledParameters(compiled)
+    else:
+        document.loadPriorParameters(filename)
+    return document
+
+def get_document():
+    """Return the shared Document, loading priorParamFile on first use."""
+    global _document
+    if _document is None:
+        _document = load_document(priorParamFile)
+    return _document
@@ -21,6 +21,7 @@ from google.appengine.ext import db
 from google.appengine.api import users
 #from pygeocoder import Geocoder
 import stockretriever
+from document import get_document
 import ra2616Test
 from ra2616Test  import getSentiment
 from xml.dom import minidom
@@ -286,6 +287,7 @@ class MainPage(webapp2.RequestHandler):
             self.response.write('<p><h3><b>%s</b></h3></p>' %s)
             news = stocks.get_news_feed(symbols)
             c = 0
+            texts = []
             for newsitems in news:
                 title = ''
                 desc = ''
@@ -297,8 +299,10 @@ class MainPage(webapp2.RequestHandler):
             
                 if newsitems['description']:
                     desc = newsitems['description']
-                r = ra2616Test.getSentiment(title + desc)
-                
+                texts.append(title + desc)
+            
+            labels, margins = ra2616Test.score_batch(texts)
+            for r in labels:
                 if(r == 0):
                     c = c - 1
                 else:
@@ -360,9 +364,9 @@ class MainPage(webapp2.RequestHandler):
         s = 'What Google News has to say about your Company'
         self.response.write('<p><h2><b>%s</b></h2></p>' %s)
         c = 0
-        for newstitle,news in getNews(company):
-            r = ra2616Test.getSentiment(news)
-            
+        labels, margins = ra2616Test.score_batch(
+            [news for newstitle,news in getNews(company)])
+        for r in labels:
             if(r == 0):
                 c = c - 1
             else:
@@ -391,88 +395,9 @@ class MainPage(webapp2.RequestHandler):
                 c = self.removeStopwords(c)
                 self.content = " ".join(c)
                 
-        class Document : 
-            def __init__(self) :
-                self.vocabulary = []
-                self.c1Prob = 0.0
-                self.c0Prob = 0.0
-                self.condProb = {}
-    
-            def removeStopwords(self, tokens) :
-                pattern = '^[0-9]+$'
-                stopwords = ['rt','amp','i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours', 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers', 'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 'that', 'these', 'those', 'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 'by', 'for', 'with', 'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'to', 'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 'again', 'further', 'then', 'once', 'here', 'there', 'when', 'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will', 'just', 'don', 'should', 'now', '']
-                
-                noStopwordsText = []
-                for word in tokens :
-                        if word in stopwords or word[:4] == 'http' or re.match(pattern,word) or re.match('@',word):
-                                noStopwordsText.append('')
-                        else: 
-                                noStopwordsText.append(word)
-                        
-                noStopwordsText = filter(None, noStopwordsText)
-                return noStopwordsText
-            
-            def loadPriorParameters(self,priorParamFile) :
-                inputFile = open(priorParamFile,"rb")
-                line = inputFile.readline().strip()
-                
-                parameters = line.split()
-                
-                self.c1Prob = float(parameters[0])
-                self.c0Prob = float(parameters[1])
-                
-                line = inputFile.readline().strip()
-                
-                while line :
-                        parameters = line.split()
-                        self.condProb[(parameters[0], int(parameters[1]))] = float(parameters[2])
-                        self.vocabulary.append(parameters[0])
-                        
-                        line = inputFile.readline().strip()
-                
-                self.vocabulary = list(set(self.vocabulary))
-                
-            def testModel(self, tweet) :
-                import math
-                
-                v = []
-                for eachWord in tweet :
-                        v.append(eachWord)
-                score = []
-                maxScore = float('-inf')
-                maxLabel = ' '
-                for c1 in range(0,2) :
-                        if c1 == 0 :
-                                priorProb = self.c0Prob
-                        else :
-                                priorProb = self.c1Prob
-                        score.append(math.log(priorProb))
-
-                        for eachTerm in self.vocabulary :
-                                if eachTerm in v :
-                                        score[c1] = score[c1] + math.log(self.condProb[(eachTerm,c1)])
-                                        
-                                else :
-                                        score[c1] = score[c1] + math.log(1.0 - self.condProb[(eachTerm,c1)])
-
-                        
-                        if score[c1] > maxScore :
-                                maxScore = score[c1]
-                                maxLabel = str(c1)
-                
-                
-                return maxLabel
-
-            def scoreTweet(self, testTweet):
-                testTweet = self.removeStopwords(testTweet.split())
-        
-                label = self.testModel(testTweet)
-                return label
-        
         def returnSentiment(testTweet) :
-            #Call these two lines first to load the model file
-            testingFile = Document()
-            testingFile.loadPriorParameters("model.file")
+            #the model is loaded on the first call only, then shared
+            testingFile = get_document()
         
             #Use the testingFile object to call scoreTweet with the test tweet as arguments.
             #It will return 1 for positive, 0 for negative
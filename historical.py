@@ -0,0 +1,231 @@
+"""
+Stream Yahoo! Finance historical price CSV into typed NumPy arrays.
+
+A body like
+
+    Date,Open,High,Low,Close,Volume,Adj Close
+    2018-05-11,46.66,46.97,46.45,46.87,5238700,46.87
+    ...
+
+is read chunk_size bytes at a time and every chunk of whole lines is
+parsed by NumPy in one go, dates with astype('datetime64[D]') and the six
+numbers with numpy.fromstring, so no Python string or float is made per
+cell and memory is the 56 bytes of a row plus one chunk. Chunks numpy
+cannot read as a whole (empty or "null" fields) are parsed line by line,
+with NaN for the missing values.
+
+    prices = fetch_prices('YHOO', start=date(1996, 1, 1))
+    prices['close'][prices['date'] >= np.datetime64('2018-01-01')]
+
+symbols, indptr, prices = concatenate(...) keeps many symbols in one
+array, the rows of symbols[i] are prices[indptr[i]:indptr[i + 1]].
+"""
+from __future__ import division
+import warnings
+import numpy as np
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from param import HISTORICAL_URL
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume', 'adj_close')
+PRICE_DTYPE = np.dtype([('date', 'datetime64[D]')] +
+                       [(name, '<f8') for name in FIELDS])
+# keys of the rows StockRetriever.get_historical_info returns
+ROW_KEYS = ('Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'AdjClose')
+
+_DATE = len('2018-05-11')
+_SPACE = ord(' ')
+
+
+def _parse_line(line):
+    """One row the slow way, NaN for the numbers float() cannot read."""
+    cells = line.strip().split(b',')
+    if len(cells) != len(PRICE_DTYPE):
+        raise ValueError('%r is not a row of prices' % line)
+    row = [np.datetime64(cells[0].strip().decode('ascii'), 'D')]
+    for cell in cells[1:]:
+        try:
+            row.append(float(cell))
+        except ValueError:
+            row.append(np.nan)
+    return tuple(row)
+
+
+def _parse_block(block):
+    """Parse whole lines (each ending with a newline) of the CSV."""
+    if not block:
+        return np.empty(0, dtype=PRICE_DTYPE)
+    data = np.frombuffer(block, dtype=np.uint8).copy()
+    data[data == ord('\r')] = _SPACE
+    ends = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    blank = ends - starts <= _DATE
+    for start, end in zip(starts[blank], ends[blank]):
+        if data[start:end].tobytes().strip():
+            raise ValueError('%r is not a row of prices'
+                             % data[start:end].tobytes())
+        data[start:end + 1] = _SPACE
+    starts, ends = starts[~blank], ends[~blank]
+    prices = np.empty(len(starts), dtype=PRICE_DTYPE)
+    if not len(prices):
+        return prices
+
+    date_bytes = data[starts[:, None] + np.arange(_DATE)]
+    try:
+        if (data[starts + _DATE] != ord(',')).any():
+            raise ValueError('dates are not YYYY-MM-DD')
+        # every line needs its own six numbers, a short row would
+        # otherwise take numbers of the next one
+        commas = np.add.reduceat(data == ord(','), starts)
+        if (commas != len(FIELDS)).any():
+            raise ValueError('not %d numbers a row' % len(FIELDS))
+        prices['date'] = date_bytes.view('S%d' % _DATE).ravel().astype(
+            'datetime64[D]')
+        # blank the dates out and read the rest as one list of numbers
+        data[starts[:, None] + np.arange(_DATE + 1)] = _SPACE
+        data[ends[:-1]] = ord(',')
+        data[ends[-1]] = _SPACE
+        # fromstring reads an empty or blank cell as -1, leave those
+        # to _parse_line, which makes them NaN
+        cells = data[data != _SPACE] == ord(',')
+        if cells[0] or cells[-1] or (cells[1:] & cells[:-1]).any():
+            raise ValueError('empty cells')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            values = np.fromstring(data.tobytes(), sep=',')
+        if len(values) != len(FIELDS) * len(prices):
+            raise ValueError('not %d numbers a row' % len(FIELDS))
+    except (ValueError, DeprecationWarning):
+        lines = block.splitlines()
+        return np.array([_parse_line(line) for line in lines
+                         if line.strip()], dtype=PRICE_DTYPE)
+    values = values.reshape(-1, len(FIELDS))
+    for i, name in enumerate(FIELDS):
+        prices[name] = values[:, i]
+    return prices
+
+
+def read_csv(stream, max_rows=None, chunk_size=1 << 16):
+    """
+    Parse a historical prices CSV from a binary file-like object.
+
+    Reading stops as soon as max_rows rows were parsed, the rest of the
+    stream is never read. Returns a PRICE_DTYPE array in file order.
+    """
+    parts = []
+    rows = 0
+    rest = b''
+    header = None
+    while max_rows is None or rows < max_rows:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        block = rest + chunk
+        end = block.rfind(b'\n') + 1
+        block, rest = block[:end], block[end:]
+        if header is None:
+            if not block:
+                continue
+            header, block = block.split(b'\n', 1)
+            if not header.startswith(b'Date,'):
+                raise ValueError('%r is not a historical prices header'
+                                 % header[:80])
+        part = _parse_block(block)
+        parts.append(part)
+        rows += len(part)
+    if rest.strip() and (max_rows is None or rows < max_rows):
+        if header is None:
+            raise ValueError('%r is not a historical prices header'
+                             % rest[:80])
+        parts.append(_parse_block(rest + b'\n'))
+    if not parts:
+        return np.empty(0, dtype=PRICE_DTYPE)
+    prices = np.concatenate(parts)
+    return prices[:max_rows] if max_rows is not None else prices
+
+
+def historical_url(symbol, start=None, end=None, interval='d'):
+    """URL of the CSV of symbol between the dates start and end."""
+    url = HISTORICAL_URL + symbol
+    # months count from 0 in the query
+    if end is not None:
+        url += '&d=%d&e=%d&f=%d' % (end.month - 1, end.day, end.year)
+    if start is not None:
+        url += '&a=%d&b=%d&c=%d' % (start.month - 1, start.day, start.year)
+    return url + '&g=%s&ignore=.csv' % interval
+
+
+def fetch_prices(symbol, start=None, end=None, interval='d', max_rows=None,
+                 chunk_size=1 << 16):
+    """
+    Download and parse the prices of symbol while they stream in.
+
+    interval is 'd', 'w' or 'm' bars, start and end are datetime.date.
+    """
+    response = urlopen(historical_url(symbol, start, end, interval))
+    try:
+        return read_csv(response, max_rows, chunk_size)
+    finally:
+        response.close()
+
+
+def from_rows(rows):
+    """PRICE_DTYPE array of the rows of StockRetriever.get_historical_info."""
+    prices = np.empty(len(rows), dtype=PRICE_DTYPE)
+    prices['date'] = [row['Date'] for row in rows]
+    for name, key in zip(FIELDS, ROW_KEYS[1:]):
+        prices[name] = [row[key] if row[key] not in (None, 'null', '')
+                        else np.nan for row in rows]
+    return prices
+
+
+def concatenate(prices_by_symbol):
+    """
+    Stack the arrays of many symbols into one.
+
+    prices_by_symbol is a dict or (symbol, prices) pairs. Returns
+    (symbols, indptr, prices), the rows of symbols[i] are
+    prices[indptr[i]:indptr[i + 1]].
+    """
+    if hasattr(prices_by_symbol, 'items'):
+        prices_by_symbol = prices_by_symbol.items()
+    symbols = []
+    parts = []
+    for symbol, part in prices_by_symbol:
+        symbols.append(symbol)
+        parts.append(part)
+    indptr = np.zeros(len(parts) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(part) for part in parts])
+    if not parts:
+        return symbols, indptr, np.empty(0, dtype=PRICE_DTYPE)
+    return symbols, indptr, np.concatenate(parts)
+
+
+def to_arrow(prices, symbols=None, indptr=None):
+    """
+    pyarrow.Table of a PRICE_DTYPE array.
+
+    With the symbols and indptr of concatenate() a "symbol" column is
+    added, dictionary encoded so that it costs 4 bytes a row.
+    """
+    if pa is None:
+        raise ImportError('to_arrow needs pyarrow, pip install pyarrow')
+    columns = [pa.array(prices['date'])]
+    columns += [pa.array(prices[name]) for name in FIELDS]
+    names = list(PRICE_DTYPE.names)
+    if symbols is not None:
+        counts = np.diff(indptr)
+        indices = np.repeat(np.arange(len(symbols), dtype=np.int32), counts)
+        columns.insert(0, pa.DictionaryArray.from_arrays(
+            indices, pa.array(symbols, pa.string())))
+        names.insert(0, 'symbol')
+    return pa.Table.from_arrays(columns, names=names)
@@ -0,0 +1,384 @@
+#! /usr/local/bin/python3
+"""
+.. module:: columnar_export
+    :synopsis: export DBWrapper tables to day partitioned Parquet / Arrow
+
+|  the files are laid out hive style, one directory per day of the time
+   attr, eg: out/day=2018-05-13/part-000003.parquet
+|  every sync only appends new part files, what was already exported is
+   kept in out/_sync_state.json
+|  part files are written to out/_staging first and moved into place
+   once the state is saved, so a stopped sync leaves no part files
+   behind whose rows would be exported again
+|  needs pyarrow, which is optional for the rest of the package
+
+>>> python3 -m modules.columnar_export news.db yahoo_news news_parquet
+
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import shutil
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from modules.db_wrapper import DBWrapper
+
+STATE_FILE = "_sync_state.json"
+# part files of the running sync, ignored by pyarrow like STATE_FILE
+STAGING_DIR = "_staging"
+# file extension and pyarrow.dataset format of each export format
+FORMATS = {"parquet": (".parquet", "parquet"), "arrow": (".arrow", "ipc")}
+# partition of rows whose time attr is not a number
+NO_DAY = "unknown"
+
+
+def _check_pyarrow():
+    if pa is None:
+        raise ImportError("columnar export needs pyarrow, "
+                          "pip install pyarrow")
+
+
+def _day(value):
+    # utc day of a unix time stamp, the partition of the row
+    try:
+        moment = datetime.datetime.fromtimestamp(float(value),
+                                                 datetime.timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return NO_DAY
+    return moment.strftime("%Y-%m-%d")
+
+
+def _to_int(value):
+    if isinstance(value, int):
+        # 64-bit ids do not survive a trip through float
+        return value
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _arrow_type(declared_type):
+    if "INT" in declared_type:
+        return pa.int64()
+    if declared_type in ("REAL", "FLOAT", "DOUBLE"):
+        return pa.float64()
+    return pa.string()
+
+
+def _schema(types, attrs_list, attr):
+    # declared sqlite types where there are any, the time attr is always
+    # an integer so that the days can be computed from it
+    return pa.schema([(a, pa.int64() if a == attr
+                       else _arrow_type(types.get(a, "")))
+                      for a in attrs_list])
+
+
+def _convert(value, arrow_type):
+    if value is None:
+        return None
+    if arrow_type == pa.int64():
+        return _to_int(value)
+    if arrow_type == pa.float64():
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+def _load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _finish_pending(out_dir, state):
+    # move the part files of a sync whose state is saved into place,
+    # anything else in the staging directory is from a stopped sync
+    staging = os.path.join(out_dir, STAGING_DIR)
+    for name in state.get("pending", []):
+        staged = os.path.join(staging, name)
+        if os.path.exists(staged):
+            target = os.path.join(out_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged, target)
+    if state.get("pending"):
+        state["pending"] = []
+        _save_state(out_dir, state)
+    shutil.rmtree(staging, ignore_errors=True)
+
+
+class _DayWriter(object):
+    """
+        one part file of one day, written batch by batch
+    """
+    def __init__(self, root, day, part, fmt, schema):
+        # name is the path relative to root
+        self.name = os.path.join("day={}".format(day), "part-{:06d}{}".format(
+                                 part, FORMATS[fmt][0]))
+        self.path = os.path.join(root, self.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._schema = schema
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self.path, schema)
+        else:
+            self._writer = pa.ipc.new_file(self.path, schema)
+
+    def write(self, rows):
+        columns = [[_convert(row[i], field.type) for row in rows]
+                   for i, field in enumerate(self._schema)]
+        self._writer.write_batch(pa.record_batch(columns,
+                                                 schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def sync_table(db, table_name, out_dir, attr="pubDate", fmt="parquet",
+               batch_size=10000):
+    """
+    |  export the rows of table_name not exported to out_dir yet
+    |  rows are read in insertion order, batch_size at a time, each batch
+       is written day by day, so there is one part file open at a time
+       and memory does not grow with the table
+    |  the first sync starts the insert log of table_name, see
+       DBWrapper.create_insert_log(), with the rows already in the table
+       in attr order, later syncs export the rows logged since the last
+       one, whatever their ids and attr values, rows updated after their
+       export are not exported again
+
+    :Args:
+        |  db (DBWrapper): db to read from
+        |  table_name (string): table name
+        |  out_dir (string): directory of the export
+
+    :Kwargs:
+        |  attr (string): time column the days are taken from,
+            default: "pubDate"
+        |  fmt (string): "parquet" or "arrow" (Arrow IPC),
+            default: "parquet"
+        |  batch_size (int): rows per read and per written batch,
+            default: 10000
+
+    :Returns:
+        |  a dict with "rows" and "files" written and "seconds"
+
+    >>> with DBWrapper("news.db") as db:
+    ...     sync_table(db, "yahoo_news", "news_parquet")
+    >>> {'rows': 1274, 'files': 3, 'seconds': 0.2}
+    """
+    _check_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError("fmt must be one of {}".format(", ".join(FORMATS)))
+    begin = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir) or {"table": table_name, "attr": attr,
+                                     "format": fmt, "last_seq": None,
+                                     "next_part": 0, "pending": []}
+    if (state["table"], state["attr"], state["format"]) != \
+            (table_name, attr, fmt):
+        raise ValueError("{} holds an export of {}.{} as {}".format(
+                         out_dir, state["table"], state["attr"],
+                         state["format"]))
+    _finish_pending(out_dir, state)
+
+    types = db.get_table_types(table_name)
+    attrs_list = db.get_table_attrs_list(table_name)
+    schema = _schema(types, attrs_list, attr)
+    position = attrs_list.index(attr)
+    db.create_insert_log(table_name, order_by=attr)
+    batches = db.iter_data_logged_after(table_name, state["last_seq"],
+                                        attrs_list, batch_size=batch_size)
+
+    staging = os.path.join(out_dir, STAGING_DIR)
+    written = list()
+    rows = 0
+    writer = None
+    day = None
+    try:
+        for batch in batches:
+            state["last_seq"] = batch[-1][0]
+            # rows inserted late with an older attr value do not open a
+            # part file for every day change
+            batch.sort(key=lambda row: _day(row[position + 1]))
+            pending = list()
+            for row in batch:
+                row_day = _day(row[position + 1])
+                if row_day != day:
+                    if pending:
+                        writer.write(pending)
+                        pending = list()
+                    if writer is not None:
+                        writer.close()
+                    day = row_day
+                    writer = _DayWriter(staging, day, state["next_part"],
+                                        fmt, schema)
+                    written.append(writer.name)
+                    state["next_part"] += 1
+                pending.append(row[1:])
+                rows += 1
+            if pending:
+                writer.write(pending)
+    finally:
+        if writer is not None:
+            writer.close()
+    # the sync is done once the state is saved, a sync stopped before
+    # this point leaves only staged files, which the next one removes
+    state["pending"] = written
+    _save_state(out_dir, state)
+    _finish_pending(out_dir, state)
+    files = len(written)
+
+    result = {"rows": rows, "files": files, "seconds": time.time() - begin}
+    logging.info("exported {} rows of {} to {} in {} files".format(
+                 rows, table_name, out_dir, files))
+    return result
+
+
+def open_dataset(out_dir):
+    """
+    |  open an export of sync_table() as a pyarrow dataset, files are
+       memory mapped and partitioned by the "day" column
+
+    :Args:
+        |  out_dir (string): directory of the export
+
+    :Returns:
+        |  a pyarrow.dataset.Dataset
+
+    >>> open_dataset("news_parquet").to_table(columns=["title"])
+    """
+    _check_pyarrow()
+    state = _load_state(out_dir)
+    if state is None:
+        raise ValueError("{} holds no export".format(out_dir))
+    # day stays a string, "unknown" sorts after every date
+    partitioning = ds.partitioning(pa.schema([("day", pa.string())]),
+                                   flavor="hive")
+    return ds.dataset(out_dir, format=FORMATS[state["format"]][1],
+                      partitioning=partitioning,
+                      filesystem=pyarrow.fs.LocalFileSystem(use_mmap=True))
+
+
+def _time_filter(start, end, attr):
+    # the day filter lets the dataset skip whole partitions
+    return (ds.field(attr) >= start) & (ds.field(attr) < end) & \
+        (ds.field("day") >= _day(start)) & (ds.field("day") <= _day(end))
+
+
+def read_by_time(out_dir, start, end, attr="pubDate", columns=None):
+    """
+    columnar version of DBWrapper.get_data_by_time()
+
+    :Args:
+        |  out_dir (string): directory of the export
+        |  start (number): compare value, eg: unix time stamp
+        |  end (number): compare value, eg: unix time stamp
+
+    :Kwargs:
+        |  attr (string): column you want to compare between start and end,
+            default -> "pubDate"
+        |  columns (list): columns to read, default: None (all)
+
+    :Returns:
+        |  a pyarrow.Table
+
+    >>> read_by_time("news_parquet", 1526196605, 1526197778,
+    ...              columns=["title"]).to_pylist()
+    """
+    return open_dataset(out_dir).to_table(
+            columns=columns, filter=_time_filter(start, end, attr))
+
+
+def count_query_by_time(out_dir, query_list, start, end, attr="pubDate",
+                        query_col="allnews"):
+    """
+    columnar version of DBWrapper.get_count_query_by_time()
+
+    :Args:
+        |  out_dir (string): directory of the export
+        |  query_list (list): list of query words
+        |  start (number): compare value, eg: unix time stamp
+        |  end (number): compare value, eg: unix time stamp
+
+    :Kwargs:
+        |  attr (string): column you want to compare between start and end
+            , default: "pubDate"
+        |  query_col (string): can be "all", "title", "desc" or "allnews"
+            , default: "allnews"
+
+    :Returns:
+        |  a number of count
+
+    >>> count_query_by_time("news_parquet", ["金融", "觀察"],
+    ...                     1526196605, 1526197778)
+    """
+    dataset = open_dataset(out_dir)
+    # same column positions as DBWrapper._get_query_col_list()
+    names = dataset.schema.names
+    positions = list()
+    if "all" == query_col.lower():
+        positions = [1, 2, 5]
+    else:
+        if "title" in query_col.lower():
+            positions.append(1)
+        if "desc" in query_col.lower():
+            positions.append(2)
+        if "allnews" in query_col.lower():
+            positions.append(5)
+    col_list = [names[i] for i in positions]
+
+    table = dataset.to_table(columns=col_list,
+                             filter=_time_filter(start, end, attr))
+    count = 0
+    for col in col_list:
+        for q in query_list:
+            if not q:
+                continue
+            count += pc.sum(pc.count_substring(table.column(col),
+                                               q)).as_py() or 0
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="export new rows of a table to day partitioned "
+                        "Parquet / Arrow files")
+    parser.add_argument("db_name")
+    parser.add_argument("table_name")
+    parser.add_argument("out_dir")
+    parser.add_argument("--attr", default="pubDate")
+    parser.add_argument("--format", default="parquet", choices=FORMATS)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    with DBWrapper(args.db_name) as db:
+        result = sync_table(db, args.table_name, args.out_dir, args.attr,
+                            args.format, args.batch_size)
+    print(result)
+
+
+if __name__ == '__main__':
+    main()
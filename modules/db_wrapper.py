@@ -7,17 +7,178 @@
 """
 import sqlite3
 import inspect
+import email.utils
 import hashlib
+import itertools
 import logging
+import math
+import queue
+import re
+import threading
+import time
+import zlib
+
+
+# runs of CJK (and kana / hangul) characters, which have no spaces
+# between words, so the fts index stores them as overlapping bigrams
+CJK_RUN = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff"
+                     "\uac00-\ud7af\uf900-\ufaff]+")
+
+
+def _cjk_bigrams(run, last_unigram=True):
+    # "金融觀" -> "金融 融觀 觀", the last character on its own makes
+    # every character of the run the start of some token
+    tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+    if last_unigram or len(run) == 1:
+        tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def fts_bigrams(text):
+    """
+    transform text for the fts index, runs of CJK characters become
+    overlapping bigrams, everything else is left for fts5's unicode61
+    tokenizer
+
+    >>> fts_bigrams("Apple金融觀察")
+    'Apple 金融 融觀 觀察 察 '
+    """
+    if text is None:
+        return None
+    return CJK_RUN.sub(lambda m: " " + _cjk_bigrams(m.group()) + " ",
+                       str(text))
+
+
+def fts_phrase(query):
+    """
+    transform a query word into a fts5 prefix phrase matching every text
+    that contains it (the exact count is done on the original text)
+
+    >>> fts_phrase("金融")
+    '"金融"*'
+    """
+    match = CJK_RUN.search(query)
+    if match is not None and match.end() == len(query.rstrip()):
+        # the query ends inside a run, the text can go on after it
+        head = query[:match.start()]
+        text = fts_bigrams(head) + " " + _cjk_bigrams(match.group(), False)
+    else:
+        text = fts_bigrams(query)
+    if not re.search(r"\w", text):
+        return None
+    return '"{}"*'.format(" ".join(text.split()).replace('"', '""'))
+
+
+def md5_key(text):
+    """
+    32 hex digit md5 of text, the original TEXT primary key
+
+    >>> md5_key("Hello")
+    '8b1a9953c4611296a827abf8c47804d7'
+    """
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def blake2b_key(text):
+    """
+    blake2b of text truncated to 8 bytes, as a signed 64-bit integer so
+    it can be the rowid of an INTEGER PRIMARY KEY table
+
+    >>> blake2b_key("Hello")
+    4349503209558009990
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def zlib_blob(text, level=6):
+    """
+    zlib compressed utf-8 of text, how compress_column() stores a value
+    """
+    if text is None:
+        return None
+    return zlib.compress(str(text).encode(), level)
+
+
+def zlib_text(data):
+    """
+    text of a value stored by zlib_blob(), registered as the sql function
+    zlib_text() on every DBWrapper connection
+
+    >>> zlib_text(zlib_blob("金融"))
+    '金融'
+    """
+    if data is None:
+        return None
+    return zlib.decompress(data).decode()
+
+
+def rss_time_to_timestamp(value):
+    """
+    unix time stamp of a RSS (RFC 822) date as crawled into pubDate, other
+    values are returned as they are, so converting twice changes nothing
+
+    >>> rss_time_to_timestamp("Sun, 13 May 2018 07:30:05 GMT")
+    1526196605
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        return int(email.utils.parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return value
+
+
+# key strategy name -> (key function, id column definition)
+KEY_STRATEGIES = {
+    "md5": (md5_key, "id PRIMARY KEY"),
+    "blake2b": (blake2b_key, "id INTEGER PRIMARY KEY"),
+}
 
 
 class DBWrapper(object):
     """
         DB wrapper class for easily operating db
     """
-    def __init__(self, db_name):
-        self._conn = sqlite3.connect(db_name)
+    def __init__(self, db_name, key="md5", seen_ids=False):
+        """
+        :Args:
+            |  db_name (string): db file name
+
+        :Kwargs:
+            |  key (string): how data_insert() makes the id, "md5" (32 hex
+                digit TEXT) or "blake2b" (64-bit INTEGER PRIMARY KEY, the
+                id is the rowid so the table needs no separate id index),
+                a table must always be written with the same key,
+                default: "md5"
+            |  seen_ids (bool): keep the ids of each table in memory (read
+                from the table on its first insert) and drop duplicate rows
+                before they reach sqlite, only safe if nothing else deletes
+                from or writes to the table, default: False
+
+        >>> with DBWrapper("news.db", key="blake2b", seen_ids=True) as db:
+        ...     db.create_table("yahoo_news", ["title", "pubDate"])
+        """
+        self._conn = self._connect(db_name)
         self._cursor = self._conn.cursor()
+        self._setup(key, seen_ids)
+
+    def _setup(self, key, seen_ids):
+        self._key = key
+        self._key_func, self._id_column = KEY_STRATEGIES[key]
+        # table -> set of its ids, None when seen_ids is off
+        self._seen = dict() if seen_ids else None
+        # table -> whether it has a fts index, see create_fts_index()
+        self._fts_tables = dict()
+        # table -> {lower-cased column: side table}, see compress_column()
+        self._compressed = dict()
+
+    def _connect(self, db_name, **kwargs):
+        conn = sqlite3.connect(db_name, **kwargs)
+        conn.create_function("fts_bigrams", 1, fts_bigrams,
+                             deterministic=True)
+        conn.create_function("zlib_text", 1, zlib_text, deterministic=True)
+        return conn
 
     def __enter__(self):
         return self
@@ -43,7 +204,8 @@ class DBWrapper(object):
                        \nFile: \"{}\", line: {}, in {}\n".format(
                        e.args[0], info.filename, info.lineno, info.function))
 
-    def create_table(self, table_name, attr_list):
+    def create_table(self, table_name, attr_list, attr_types=None,
+                     time_attr="pubDate"):
         """
         create table name with attr_list
 
@@ -51,31 +213,199 @@ class DBWrapper(object):
             |  table_name (string): table name
             |  attr_list (list): table header
 
+        :Kwargs:
+            |  attr_types (dict): column type of some attrs,
+                eg: {"pubDate": "INTEGER"}, default: None (untyped)
+            |  time_attr (string): if this column is in attr_list, an index
+                is created on it for time range queries, default: "pubDate"
+
         >>> with DBWrapper() as db:
         ...     table_name = "yahoo_news"
-        ...     attr_list = ["description", "contents"]
-        ...     db.create_table(table_name, attr_list)
+        ...     attr_list = ["description", "contents", "pubDate"]
+        ...     db.create_table(table_name, attr_list,
+        ...                     attr_types={"pubDate": "INTEGER"})
 
-        this will create table name "yahoo_news" and
-        column ["id", "description", "contents"]
+        this will create table name "yahoo_news",
+        column ["id", "description", "contents", "pubDate"]
+        and an index on "pubDate"
         """
-        attr_list = ["id PRIMARY KEY"] + attr_list
-        str_attr = ",".join(attr_list)
+        attr_types = attr_types or {}
+        columns = [" ".join([attr, attr_types[attr]])
+                   if attr in attr_types else attr
+                   for attr in attr_list]
+        str_attr = ",".join([self._id_column] + columns)
         try:
             sql = '''CREATE TABLE IF NOT EXISTS {} ({})'''.format(
                     table_name, str_attr)
             self._cursor.execute(sql)
         except sqlite3.Error as e:
             self._print_error(e)
+            return
+        if time_attr in attr_list:
+            self.create_index(table_name, time_attr)
+
+    def create_index(self, table_name, attr):
+        """
+        create index on attr of table_name if it does not exist yet
+
+        :Args:
+            |  table_name (string): table name
+            |  attr (string): column to index
+
+        >>> with DBWrapper() as db:
+        ...     db.create_index("yahoo_news", "pubDate")
+
+        this will create index "idx_yahoo_news_pubDate"
+
+        |  range queries do not create indexes, tables made before
+           create_table() indexed the time attr need one once, eg: as a
+           migrate() step:
+
+        >>> with DBWrapper("news.db") as db:
+        ...     db.migrate([(1, "CREATE INDEX IF NOT EXISTS "
+        ...                     "idx_yahoo_news_pubDate ON yahoo_news "
+        ...                     "(pubDate)")])
+        """
+        try:
+            sql = "CREATE INDEX IF NOT EXISTS idx_{0}_{1} ON {0} ({1})".format(
+                    table_name, attr)
+            self._cursor.execute(sql)
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+    def _time_range_sql(self, table_name, attr, str_attr="*",
+                        from_sql=None):
+        # placeholders keep the sql text constant, so sqlite3 reuses the
+        # prepared statement from its cache
+        return "SELECT {} from {} where {} >= ? and {} < ?".format(
+                str_attr, from_sql or table_name, attr, attr)
+
+    def _compressed_cols(self, table_name):
+        # {lower-cased column: side table} of the columns compress_column()
+        # moved out of table_name
+        if table_name not in self._compressed:
+            side_tables = dict()
+            prefix = table_name.lower() + "_"
+            try:
+                self._cursor.execute(
+                        "SELECT name FROM sqlite_master WHERE type = 'table'")
+                for (name, ) in self._cursor.fetchall():
+                    if name.lower().startswith(prefix) and \
+                            name.lower().endswith("_z"):
+                        side_tables[name[len(prefix):-2].lower()] = name
+            except sqlite3.Error as e:
+                self._print_error(e)
+            self._compressed[table_name] = side_tables
+        return self._compressed[table_name]
+
+    def _col_sql(self, table_name, col):
+        # sql reading col, compressed columns come from their side table
+        # joined in by _from_sql(), or from table_name itself for rows
+        # compress_column() has not moved yet
+        side_table = self._compressed_cols(table_name).get(col.lower())
+        if side_table is None:
+            return col
+        return "COALESCE({}.{}, zlib_text({}_data))".format(
+                table_name, col, side_table)
+
+    def _from_sql(self, table_name, col_list=None):
+        # table_name LEFT JOINed with the side tables of the compressed
+        # columns in col_list (None for all), their columns are renamed so
+        # that id still means table_name.id, rowid has to be written
+        # table_name.rowid though
+        side_tables = self._compressed_cols(table_name)
+        if col_list is not None:
+            side_tables = dict((col.lower(), side_tables[col.lower()])
+                               for col in col_list
+                               if col.lower() in side_tables)
+        sql = table_name
+        for _, side_table in sorted(side_tables.items()):
+            sql += " LEFT JOIN (SELECT id AS {0}_id, data AS {0}_data " \
+                   "FROM {0}) ON {0}_id = {1}.id".format(side_table,
+                                                         table_name)
+        return sql
+
+    def _select_attrs(self, table_name, attr_list):
+        # select list of attr_list (None for all), compressed columns are
+        # read back as text under their own name
+        if not self._compressed_cols(table_name):
+            return ",".join(attr_list) if attr_list else "*"
+        if not attr_list:
+            attr_list = self.get_table_attrs_list(table_name)
+        return ",".join(["{} AS {}".format(self._col_sql(table_name, attr),
+                                           attr)
+                         if attr.lower() in self._compressed[table_name]
+                         else attr for attr in attr_list])
+
+    def _time_value(self, value):
+        # numbers given as strings used to be formatted into the sql as
+        # numeric literals, keep comparing them as numbers
+        if isinstance(value, str):
+            for convert in (int, float):
+                try:
+                    return convert(value)
+                except ValueError:
+                    pass
+        return value
+
+    def get_query_plan_by_time(self, table_name, start, end, attr="pubDate",
+                               attr_list=None):
+        """
+        get sqlite "EXPLAIN QUERY PLAN" of a time range query
+
+        :Args:
+            |  table_name (string): table name
+            |  start (*): compare value, eg: unix time stamp
+            |  end (*): compare value, eg: unix time stamp
+
+        :Kwargs:
+            |  attr (string): column you want to compare between start and end,
+                default -> "pubDate"
+            |  attr_list (list): columns to select, default: None (all)
+
+        :Returns:
+            |  a list of plan detail strings
+
+        >>> with DBWrapper() as db:
+        ...     db.get_query_plan_by_time("yahoo_news", 1526196605, 1526197778)
+        >>> ['SEARCH yahoo_news USING INDEX idx_yahoo_news_pubDate (pubDate>? AND pubDate<?)']
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        try:
+            sql = "EXPLAIN QUERY PLAN " + self._time_range_sql(
+                    table_name, attr, str_attr,
+                    self._from_sql(table_name, attr_list))
+            self._cursor.execute(
+                sql, (self._time_value(start), self._time_value(end)))
+            return [row[-1] for row in self._cursor]
+        except sqlite3.Error as e:
+            self._print_error(e)
 
     def _get_hash(self, text):
-        return hashlib.md5(text.encode()).hexdigest()
+        return self._key_func(text)
+
+    def _seen_ids(self, table_name):
+        # ids already in table_name, read once and then kept up to date
+        # by _keyed_rows(), None when seen_ids is off
+        if self._seen is None:
+            return None
+        if table_name not in self._seen:
+            seen = set()
+            try:
+                self._cursor.execute("SELECT id FROM {}".format(table_name))
+                for row in self._cursor:
+                    seen.add(row[0])
+            except sqlite3.Error as e:
+                self._print_error(e)
+            self._seen[table_name] = seen
+        return self._seen[table_name]
 
     def data_insert(self, table_name, attr_list, values_list):
         """
         |  insert data into table_name with attr_list and values_list
         |  auto add primary key (id), default gen from first value of attributes
-        |  (gen method: hashlib.md5)
+        |  (gen method: hashlib.md5, see the key kwarg of DBWrapper)
+        |  rows whose id is already in the table are ignored
 
         :Args:
             |  table_name (string): table name
@@ -95,46 +425,440 @@ class DBWrapper(object):
 
         (ie: first value is gen from hashlib.md5("Hello"))
         """
-        for i in range(len(values_list)):
-            primary_key = self._get_hash(values_list[i][0])
-            values_list[i] = [primary_key] + values_list[i]
+        try:
+            self._data_insert(table_name, attr_list, values_list)
+        except sqlite3.Error as e:
+            self._print_error(e)
 
+    def _data_insert(self, table_name, attr_list, values_list):
+        # data_insert() that raises, the ids it put in the seen set are
+        # taken out again first, so the rows are not dropped as duplicates
+        # when they are inserted again
+        seen = self._seen_ids(table_name)
+        keys = list()
+        try:
+            self._insert_rows(table_name, attr_list, values_list, seen, keys)
+        except Exception:
+            if seen is not None:
+                seen.difference_update(keys)
+            raise
+        if self._has_fts_index(table_name):
+            self._sync_fts_index(table_name, keys)
+
+    def _insert_sql(self, table_name, attr_list):
         attr_list = ["id"] + attr_list
         str_attr = ",".join(attr_list)
+        sql = "INSERT OR IGNORE INTO {} ({}) VALUES".format(
+                table_name, str_attr)
+        # use ? for placeholder, num = len(attr_list)
+        tmp_str = ",".join(["?"] * len(attr_list))
+        sql += " ({})".format(tmp_str)
+        return sql
+
+    def _keyed_rows(self, values_list, seen=None, keys=None):
+        # prepend the primary key while sqlite reads the rows, so the
+        # caller's lists are neither copied up front nor changed, rows
+        # with an id in seen are dropped here instead of by sqlite
+        for values in values_list:
+            key = self._get_hash(values[0])
+            if seen is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            if keys is not None:
+                keys.append(key)
+            yield [key] + list(values)
+
+    def _insert_rows(self, table_name, attr_list, values_list, seen=None,
+                     keys=None):
+        # executemany the keyed rows, the values of compressed columns go
+        # to their side table instead, returns the rowcount of the table
+        side_tables = self._compressed_cols(table_name)
+        rows = self._keyed_rows(values_list, seen, keys)
+        compressed = [(i + 1, side_tables[attr.lower()])
+                      for i, attr in enumerate(attr_list)
+                      if attr.lower() in side_tables]
+        if compressed:
+            rows = list(rows)
+            for i, side_table in compressed:
+                self._cursor.executemany(
+                        "INSERT OR IGNORE INTO {} (id, data) "
+                        "VALUES (?, ?)".format(side_table),
+                        [(row[0], zlib_blob(row[i])) for row in rows
+                         if row[i] is not None])
+                # the lists are our own, made by _keyed_rows()
+                for row in rows:
+                    row[i] = None
+        self._cursor.executemany(self._insert_sql(table_name, attr_list),
+                                 rows)
+        return self._cursor.rowcount
+
+    def set_bulk_pragmas(self, cache_size_kb=200000):
+        """
+        |  tune the connection for bulk loading: WAL journal,
+           synchronous=NORMAL, a bigger page cache and in-memory temp store
+        |  WAL stays on for the database file, the others for this
+           connection only
+
+        :Kwargs:
+            |  cache_size_kb (int): page cache size in KB, default: 200000
+
+        >>> with DBWrapper("news.db") as db:
+        ...     db.set_bulk_pragmas()
+        """
         try:
-            sql = "INSERT OR IGNORE INTO {} ({}) VALUES".format(
-                    table_name, str_attr)
-            # use ? for placeholder, num = len(attr_list)
-            tmp_str = ",".join(["?"] * len(attr_list))
-            sql += " ({})".format(tmp_str)
-            self._cursor.executemany(sql, values_list)
+            self._cursor.execute("PRAGMA journal_mode=WAL")
+            self._cursor.execute("PRAGMA synchronous=NORMAL")
+            self._cursor.execute("PRAGMA cache_size=-{}".format(
+                                 int(cache_size_kb)))
+            self._cursor.execute("PRAGMA temp_store=MEMORY")
         except sqlite3.Error as e:
             self._print_error(e)
 
+    def bulk_insert(self, table_name, attr_list, values_iter,
+                    commit_every=10000, cache_size_kb=200000):
+        """
+        |  bulk load version of data_insert() for backfills
+        |  values_iter can be any iterable, eg: a generator, rows are
+           inserted and committed in transactions of commit_every rows,
+           so memory stays bounded and the input is never changed
+        |  the connection is switched to set_bulk_pragmas() first
+
+        :Args:
+            |  table_name (string): table name
+            |  attr_list (list): table header
+            |  values_iter (iterable): values lists you want to insert
+
+        :Kwargs:
+            |  commit_every (int): rows per transaction, default: 10000
+            |  cache_size_kb (int): page cache size in KB, default: 200000
+
+        :Returns:
+            |  a dict with "rows" committed, "inserted" rows (duplicates
+               are ignored), "seconds" and "rows_per_sec"
+            |  a chunk that fails is rolled back and stops the insert,
+               the chunks before it stay committed
+
+        >>> def rows():
+        ...     for item in crawled_news():
+        ...         yield [item["title"], item["description"]]
+        >>> with DBWrapper("news.db") as db:
+        ...     db.bulk_insert("yahoo_news", ["title", "description"], rows())
+        >>> {'rows': 500000, 'inserted': 498213, 'seconds': 21.3, ...}
+        """
+        # journal_mode can not change inside an open transaction
+        self._commit()
+        self.set_bulk_pragmas(cache_size_kb)
+        has_fts_index = self._has_fts_index(table_name)
+        seen = self._seen_ids(table_name)
+        values_iter = iter(values_iter)
+        rows = 0
+        inserted = 0
+        begin = time.time()
+        try:
+            while True:
+                # the chunk holds references to the caller's rows only
+                chunk = list(itertools.islice(values_iter, commit_every))
+                if not chunk:
+                    break
+                # explicit, so autocommit connections get one
+                # transaction per chunk too
+                self._cursor.execute("BEGIN")
+                keys = list()
+                try:
+                    count = self._insert_rows(table_name, attr_list, chunk,
+                                              seen, keys)
+                    if has_fts_index:
+                        self._sync_fts_index(table_name, keys)
+                    self._commit()
+                except Exception:
+                    # none of the chunk is kept, nor marked as seen
+                    self._conn.rollback()
+                    if seen is not None:
+                        seen.difference_update(keys)
+                    raise
+                rows += len(chunk)
+                inserted += max(count, 0)
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+        seconds = time.time() - begin
+        result = {"rows": rows,
+                  "inserted": inserted,
+                  "seconds": seconds,
+                  "rows_per_sec": rows / seconds if seconds > 0 else 0.0}
+        logging.info("bulk insert into {}: {} rows, {:.0f} rows/sec".format(
+                     table_name, rows, result["rows_per_sec"]))
+        return result
+
+    def compress_column(self, table_name, attr="allNews", level=6,
+                        batch_rows=1000, vacuum=False, page_size=None):
+        """
+        |  migrate attr of table_name to zlib compressed storage in the
+           side table "<table_name>_<attr>_z" (id, data)
+        |  the column stays in table_name but holds NULL, so scans that do
+           not read attr (eg: titles by time) never load the big values
+        |  reads of attr are decompressed in sqlite, everything written
+           with data_insert() or bulk_insert() afterwards is stored
+           compressed too
+        |  rows are moved batch_rows at a time, each batch is committed, so
+           a stopped migration can simply be run again, rows not moved yet
+           are read from table_name meanwhile
+
+        :Args:
+            |  table_name (string): table name
+
+        :Kwargs:
+            |  attr (string): column to compress, default: "allNews"
+            |  level (int): zlib level, 1 (fast) to 9 (small), default: 6
+            |  batch_rows (int): rows per transaction, default: 1000
+            |  vacuum (bool): VACUUM afterwards, so the file shrinks,
+                default: False
+            |  page_size (int): page size set before the VACUUM, values of
+                a few KB leave half of a 4096 byte page empty, 16384 packs
+                them tighter, not possible in WAL mode, default: None
+
+        :Returns:
+            |  a dict with "rows" moved, "bytes" of text before and
+               "compressed_bytes" after, and "seconds"
+
+        >>> with DBWrapper("news.db") as db:
+        ...     db.compress_column("yahoo_news", "allNews", vacuum=True,
+        ...                        page_size=16384)
+        >>> {'rows': 52811, 'bytes': 163524388, 'compressed_bytes': ...}
+        """
+        side_table = "{}_{}_z".format(table_name, attr)
+        result = {"rows": 0, "bytes": 0, "compressed_bytes": 0}
+        begin = time.time()
+        try:
+            self._cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS {} ({}, data BLOB)".format(
+                        side_table, self._id_column))
+            self._commit()
+            self._compressed.pop(table_name, None)
+            for rows in self._rowid_batches(
+                    table_name, ["id", attr], batch_rows,
+                    "{} IS NOT NULL".format(attr)):
+                data = [(key, zlib_blob(text, level)) for _, key, text in rows]
+                self._cursor.execute("BEGIN")
+                self._cursor.executemany(
+                        "INSERT OR REPLACE INTO {} (id, data) "
+                        "VALUES (?, ?)".format(side_table), data)
+                self._cursor.executemany(
+                        "UPDATE {} SET {} = NULL WHERE rowid = ?".format(
+                            table_name, attr),
+                        [(row[0], ) for row in rows])
+                self._commit()
+                result["rows"] += len(rows)
+                result["bytes"] += sum(len(str(text).encode())
+                                       for _, _, text in rows)
+                result["compressed_bytes"] += sum(len(d) for _, d in data)
+            if vacuum:
+                if page_size:
+                    self._cursor.execute("PRAGMA page_size={}".format(
+                                         int(page_size)))
+                self._cursor.execute("VACUUM")
+                if self._has_fts_index(table_name):
+                    # VACUUM may renumber the rowids of tables without an
+                    # INTEGER PRIMARY KEY, which the fts index refers to
+                    self._cursor.execute(
+                            "INSERT INTO {0}_fts ({0}_fts) "
+                            "VALUES ('delete-all')".format(table_name))
+                    self._sync_fts_index(table_name)
+                    self._commit()
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+        result["seconds"] = time.time() - begin
+        logging.info("compressed {}.{}: {} rows, {} -> {} bytes".format(
+                     table_name, attr, result["rows"], result["bytes"],
+                     result["compressed_bytes"]))
+        return result
+
+    def _rowid_batches(self, table_name, attr_list, batch_rows,
+                       where=None):
+        # [rowid] + attr_list rows of table_name in rowid order, batch_rows
+        # at a time, each batch is read completely before it is yielded,
+        # so the caller can update those rows on the same cursor
+        conditions = [where] if where else list()
+        sql = "SELECT rowid, {} FROM {}{} ORDER BY rowid LIMIT ?"
+        last = None
+        while True:
+            if last is None:
+                parameters = [batch_rows]
+                condition = conditions
+            else:
+                parameters = [last, batch_rows]
+                condition = ["rowid > ?"] + conditions
+            self._cursor.execute(sql.format(
+                    ",".join(attr_list) or "rowid", table_name,
+                    " WHERE " + " AND ".join(condition) if condition else ""),
+                    parameters)
+            rows = self._cursor.fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+
+    def convert_column(self, table_name, attr, convert=None, sql=None,
+                       batch_rows=10000, progress=None):
+        """
+        |  rewrite every value of attr in one pass over table_name,
+           batch_rows rows per transaction, eg: text dates to time stamps
+        |  give either convert, a python function called with the old value
+           (only changed values are written back), or sql, an expression
+           evaluated by sqlite (faster, no values leave the database)
+        |  a stopped conversion can be run again if convert leaves
+           converted values as they are
+        |  if a batch fails (sqlite error or convert raising) it is rolled
+           back and the error raised, the batches before it stay converted
+
+        :Args:
+            |  table_name (string): table name
+            |  attr (string): column to convert
+
+        :Kwargs:
+            |  convert (function): new value from old value, default: None
+            |  sql (string): sql expression of the new value,
+                eg: "CAST(pubDate AS INTEGER)", default: None
+            |  batch_rows (int): rows per transaction, default: 10000
+            |  progress (function): called with (rows done, rows in total)
+                after every batch, default: None (log it)
+
+        :Returns:
+            |  a dict with "rows" read, "changed" rows and "seconds"
+
+        >>> with DBWrapper("news.db") as db:
+        ...     db.convert_column("yahoo_news", "pubDate",
+        ...                       rss_time_to_timestamp)
+        >>> {'rows': 52811, 'changed': 52811, 'seconds': 1.9}
+        """
+        if (convert is None) == (sql is None):
+            raise ValueError("give one of convert or sql")
+        result = {"rows": 0, "changed": 0}
+        begin = time.time()
+        try:
+            self._commit()
+            self._cursor.execute("SELECT count(*) FROM {}".format(
+                                 table_name))
+            total = self._cursor.fetchone()[0]
+            for rows in self._rowid_batches(
+                    table_name, [] if sql else [attr], batch_rows):
+                self._cursor.execute("BEGIN")
+                if sql:
+                    self._cursor.execute(
+                            "UPDATE {} SET {} = ({}) WHERE rowid BETWEEN ? "
+                            "AND ?".format(table_name, attr, sql),
+                            (rows[0][0], rows[-1][0]))
+                    result["changed"] += max(self._cursor.rowcount, 0)
+                else:
+                    changes = list()
+                    for rowid, value in rows:
+                        new_value = convert(value)
+                        if new_value != value:
+                            changes.append((new_value, rowid))
+                    self._cursor.executemany(
+                            "UPDATE {} SET {} = ? WHERE rowid = ?".format(
+                                table_name, attr), changes)
+                    result["changed"] += len(changes)
+                self._commit()
+                result["rows"] += len(rows)
+                if progress is not None:
+                    progress(result["rows"], total)
+                else:
+                    logging.info("converting {}.{}: {}/{} rows".format(
+                                 table_name, attr, result["rows"], total))
+        except Exception as e:
+            if isinstance(e, sqlite3.Error):
+                self._print_error(e)
+            self._conn.rollback()
+            raise
+
+        result["seconds"] = time.time() - begin
+        return result
+
+    def get_schema_version(self):
+        """
+        get the schema version migrate() brought the db to
+
+        :Returns:
+            |  a number, 0 for a db never migrated
+        """
+        try:
+            self._cursor.execute("PRAGMA user_version")
+            return self._cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+    def migrate(self, steps):
+        """
+        |  bring the db up to the newest schema version of steps
+        |  steps are run in version order, each version is stored in the db
+           once its step is done (sqlite "PRAGMA user_version"), so running
+           migrate() again only runs new steps, a failed step stops it
+           and its version is not stored (sqlite errors are logged, other
+           errors of a function step are raised)
+        |  a step is sql (a string or list of strings, run in one
+           transaction with the version update) or a function called with
+           this DBWrapper, eg: using convert_column()
+
+        :Args:
+            |  steps (list): (version, step) pairs, versions from 1 up
+
+        :Returns:
+            |  the schema version of the db afterwards
+
+        >>> NEWS_MIGRATIONS = [
+        ...     (1, lambda db: db.convert_column(
+        ...             "yahoo_news", "pubDate", rss_time_to_timestamp)),
+        ...     (2, "CREATE INDEX IF NOT EXISTS idx_yahoo_news_link "
+        ...         "ON yahoo_news (link)"),
+        ... ]
+        >>> with DBWrapper("news.db") as db:
+        ...     db.migrate(NEWS_MIGRATIONS)
+        >>> 2
+        """
+        version = self.get_schema_version()
+        for number, step in sorted(steps, key=lambda s: s[0]):
+            if number <= version:
+                continue
+            logging.info("migrating to schema version {}".format(number))
+            try:
+                self._commit()
+                if callable(step):
+                    step(self)
+                    self._cursor.execute("BEGIN")
+                else:
+                    self._cursor.execute("BEGIN")
+                    for sql in [step] if isinstance(step, str) else step:
+                        self._cursor.execute(sql)
+                self._cursor.execute("PRAGMA user_version = {}".format(
+                                     int(number)))
+                self._commit()
+            except sqlite3.Error as e:
+                self._print_error(e)
+                self._conn.rollback()
+                break
+            except Exception:
+                # the version is not stored, the step runs again next time
+                self._conn.rollback()
+                raise
+            version = number
+        return version
+
     def data_update_time(self, table_name, new_value, idname):
         """
-        One use function
-
-        >>> from datetime import datetime
-        ...     with DBWrapper("news.db") as db:
-        ...         table_name = "yahoo_news"
-        ...         attr_list = ["id", "pubDate"]
-        ...         data_list = db.get_data_from_attr(table_name, attr_list)
-        ...         for item in data_list:
-        ...             idname = item[0]
-        ...             strtime = item[1]
-        ...             datetime_object = datetime.strptime(strtime,
-                                                            '%a, %d %b %Y %X %Z')
-        ...             print(idname, strtime, datetime_object.timestamp())
-        ...             db.data_update_time(table_name,
-                                            int(datetime_object.timestamp()),
-                                            idname)
-        ...         print(len(data_list))
+        |  set pubDate of the row with id idname to new_value
+        |  superseded by convert_column(), which converts the whole column
+           in batches:
 
+        >>> with DBWrapper("news.db") as db:
+        ...     db.convert_column("yahoo_news", "pubDate",
+        ...                       rss_time_to_timestamp)
         """
         try:
             task = (new_value, idname)
-            sql = "UPDATE yahoo_news SET pubDate = ? WHERE id = ?"
+            sql = "UPDATE {} SET pubDate = ? WHERE id = ?".format(table_name)
             self._cursor.execute(sql, task)
         except sqlite3.Error as e:
             self._print_error(e)
@@ -166,8 +890,8 @@ class DBWrapper(object):
         """
         get data from specific attrs list
 
-        |  *** FIXME ***
-        |  now get all the data in the memory, because datas are small now
+        |  this holds all the data in memory, use iter_data_from_attr()
+           for big tables
 
         :Args:
             |  table_name (string): table name
@@ -182,10 +906,10 @@ class DBWrapper(object):
         ...     data_list = db.get_data_from_attr(table_name, attr_list)
         >>>[["xxxx", "yyyy", ...], [...]]
         """
-        str_attr = ",".join(attr_list)
+        str_attr = self._select_attrs(table_name, attr_list)
         try:
             sql = "SELECT {} FROM {}".format(
-                   str_attr, table_name)
+                   str_attr, self._from_sql(table_name, attr_list))
             self._cursor.execute(sql)
             data_list = list()
             for row in self._cursor:
@@ -200,12 +924,10 @@ class DBWrapper(object):
         |  get data from all attrs from start time to end time
         |  This is a wrapper function for easy using
 
-        |  *** FIXME ***
-        |  1. change to get attr list not 'select *'
-        |  2. now get all the data in the memory, because datas are small now
-            here can change future
+        |  this holds all the data in memory, use iter_data_by_time()
+           for big time ranges or to select only some columns
 
-        eg: SELECT * from yahoo_news where pubDate > 1526196605
+        eg: SELECT * from yahoo_news where pubDate >= ? and pubDate < ?
 
         :Args:
             |  table_name (string): table name
@@ -227,9 +949,11 @@ class DBWrapper(object):
         """
 
         try:
-            sql = "SELECT * from {} where {} >= {} and {} < {}".format(
-                   table_name, attr, start, attr, end)
-            self._cursor.execute(sql)
+            sql = self._time_range_sql(table_name, attr,
+                                       self._select_attrs(table_name, None),
+                                       self._from_sql(table_name))
+            self._cursor.execute(
+                sql, (self._time_value(start), self._time_value(end)))
             data_list = list()
             for row in self._cursor:
                 data_list.append(list(row))
@@ -238,16 +962,299 @@ class DBWrapper(object):
         except sqlite3.Error as e:
             self._print_error(e)
 
+    def _iter_query(self, sql, parameters=(), batch_size=None):
+        # own cursor, so other calls on self._cursor while the caller is
+        # still iterating do not reset this result set
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(sql, parameters)
+            size = batch_size or cursor.arraysize
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                if batch_size:
+                    yield [list(row) for row in rows]
+                else:
+                    for row in rows:
+                        yield list(row)
+        except sqlite3.Error as e:
+            self._print_error(e)
+        finally:
+            cursor.close()
+
+    def iter_data_from_attr(self, table_name, attr_list, batch_size=None):
+        """
+        |  generator version of get_data_from_attr()
+        |  rows are read from sqlite with fetchmany, so memory stays flat
+           no matter how big the table is
+
+        :Args:
+            |  table_name (string): table name
+            |  attr_list (list): table header
+
+        :Kwargs:
+            |  batch_size (int): if given, yield lists of up to batch_size
+                rows instead of single rows, default: None
+
+        :Yields:
+            |  a data list per row (or a list of data lists per batch)
+
+        >>> with DBWrapper() as db:
+        ...     table_name = "yahoo_news"
+        ...     attr_list = ["id", "title"]
+        ...     for row in db.iter_data_from_attr(table_name, attr_list):
+        ...         print(row)
+        >>>["xxxx", "yyyy"]
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        sql = "SELECT {} FROM {}".format(
+                str_attr, self._from_sql(table_name, attr_list))
+        return self._iter_query(sql, batch_size=batch_size)
+
+    def iter_data_by_time(self, table_name, start, end, attr="pubDate",
+                          attr_list=None, batch_size=None):
+        """
+        |  generator version of get_data_by_time()
+        |  rows are read from sqlite with fetchmany, so memory stays flat
+           no matter how big the time range is
+
+        :Args:
+            |  table_name (string): table name
+            |  start (*): compare value, eg: unix time stamp
+            |  end (*): compare value, eg: unix time stamp
+
+        :Kwargs:
+            |  attr (string): column you want to compare between start and end,
+                default -> "pubDate"
+            |  attr_list (list): columns to return, default: None (all)
+            |  batch_size (int): if given, yield lists of up to batch_size
+                rows instead of single rows, default: None
+
+        :Yields:
+            |  a data list per row (or a list of data lists per batch)
+
+        >>> with DBWrapper() as db:
+        ...     table_name = "yahoo_news"
+        ...     start = "1526196605"
+        ...     end = "1526197778"
+        ...     for batch in db.iter_data_by_time(table_name, start, end,
+        ...                                       attr_list=["id", "title"],
+        ...                                       batch_size=100):
+        ...         print(len(batch))
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        sql = self._time_range_sql(table_name, attr, str_attr,
+                                   self._from_sql(table_name, attr_list))
+        parameters = (self._time_value(start), self._time_value(end))
+        return self._iter_query(sql, parameters, batch_size)
+
+    def iter_data_after(self, table_name, rowid=None, attr_list=None,
+                        order_by=None, batch_size=None):
+        """
+        |  rows of table_name with a rowid greater than rowid, each as
+           [rowid] + data list, for copying a table incrementally
+        |  rowids only grow for tables with md5 ids, with integer ids
+           (key="blake2b") the rowid is the id itself
+
+        :Args:
+            |  table_name (string): table name
+
+        :Kwargs:
+            |  rowid (int): last rowid already copied, default: None (all)
+            |  attr_list (list): columns to return, default: None (all)
+            |  order_by (string): column to sort by, default: None (rowid)
+            |  batch_size (int): if given, yield lists of up to batch_size
+                rows instead of single rows, default: None
+
+        :Yields:
+            |  a [rowid] + data list per row (or a list of them per batch)
+
+        >>> with DBWrapper("news.db") as db:
+        ...     for row in db.iter_data_after("yahoo_news", 52811,
+        ...                                   attr_list=["title"]):
+        ...         print(row)
+        >>>[52812, "yyyy"]
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        if str_attr == "*":
+            str_attr = "{}.*".format(table_name)
+        sql = "SELECT {0}.rowid, {1} FROM {2}".format(
+                table_name, str_attr, self._from_sql(table_name, attr_list))
+        parameters = ()
+        if rowid is not None:
+            sql += " WHERE {}.rowid > ?".format(table_name)
+            parameters = (rowid, )
+        sql += " ORDER BY {}".format(order_by or table_name + ".rowid")
+        return self._iter_query(sql, parameters, batch_size)
+
+    def iter_data_after_key(self, table_name, attr, after=None,
+                            attr_list=None, batch_size=None):
+        """
+        |  rows of table_name in (attr, id) order that come after the
+           (attr value, id) pair after, each as [rowid] + data list, for
+           copying tables with integer ids (key="blake2b") incrementally,
+           whose rowids do not grow with every insert
+        |  rows inserted later with an attr value before the one of after
+           (NULL sorts first) are not yielded, iter_data_logged_after()
+           yields every row inserted later
+
+        :Args:
+            |  table_name (string): table name
+            |  attr (string): column to sort by, eg: "pubDate"
+
+        :Kwargs:
+            |  after (tuple): (attr value, id) of the last row already
+                copied, default: None (all)
+            |  attr_list (list): columns to return, default: None (all)
+            |  batch_size (int): if given, yield lists of up to batch_size
+                rows instead of single rows, default: None
+
+        :Yields:
+            |  a [rowid] + data list per row (or a list of them per batch)
+
+        >>> with DBWrapper("news.db", key="blake2b") as db:
+        ...     for row in db.iter_data_after_key(
+        ...             "yahoo_news", "pubDate",
+        ...             after=(1526197778, -4325010829364870981),
+        ...             attr_list=["title"]):
+        ...         print(row)
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        if str_attr == "*":
+            str_attr = "{}.*".format(table_name)
+        sql = "SELECT {0}.rowid, {1} FROM {2}".format(
+                table_name, str_attr, self._from_sql(table_name, attr_list))
+        parameters = ()
+        if after is not None and after[0] is None:
+            # NULLs sort first
+            sql += " WHERE ({0} IS NULL AND id > ?) OR {0} IS NOT " \
+                   "NULL".format(attr)
+            parameters = (after[1], )
+        elif after is not None:
+            # the >= lets sqlite search the attr index
+            sql += " WHERE {0} >= ? AND ({0} > ? OR id > ?)".format(attr)
+            parameters = (after[0], after[0], after[1])
+        sql += " ORDER BY {}, id".format(attr)
+        return self._iter_query(sql, parameters, batch_size)
+
+    def create_insert_log(self, table_name, order_by=None):
+        """
+        |  log the ids of the rows inserted into table_name in the table
+           "<table_name>_log" (seq, id), seq grows with every insert
+           whatever the ids and rowids of table_name are, so
+           iter_data_logged_after() can copy the table incrementally
+        |  the log is kept by an AFTER INSERT trigger, rows ignored as
+           duplicates are not logged
+        |  the rows already in table_name are logged first, in order_by
+           order, nothing is done if the log exists
+
+        :Args:
+            |  table_name (string): table name
+
+        :Kwargs:
+            |  order_by (string): column to log the rows already in the
+                table by, default: None (rowid)
+
+        >>> with DBWrapper("news.db", key="blake2b") as db:
+        ...     db.create_insert_log("yahoo_news", order_by="pubDate")
+        """
+        log_table = "{}_log".format(table_name)
+        try:
+            self._cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name = ?",
+                (log_table, ))
+            if self._cursor.fetchone()[0]:
+                return
+            self._commit()
+            self._cursor.execute("BEGIN")
+            self._cursor.execute(
+                    "CREATE TABLE {} (seq INTEGER PRIMARY KEY "
+                    "AUTOINCREMENT, id)".format(log_table))
+            self._cursor.execute(
+                    "INSERT INTO {} (id) SELECT id FROM {} ORDER BY "
+                    "{}".format(log_table, table_name, order_by or "rowid"))
+            self._cursor.execute(
+                    "CREATE TRIGGER {0}_insert AFTER INSERT ON {1} BEGIN "
+                    "INSERT INTO {0} (id) VALUES (new.id); END".format(
+                        log_table, table_name))
+            self._commit()
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            self._print_error(e)
+
+    def iter_data_logged_after(self, table_name, seq=None, attr_list=None,
+                               batch_size=None):
+        """
+        |  rows of table_name logged by create_insert_log() after seq, in
+           the order they were inserted, each as [seq] + data list
+        |  unlike iter_data_after() and iter_data_after_key(), no row
+           inserted after seq is missed, whatever its id or attr values
+
+        :Args:
+            |  table_name (string): table name
+
+        :Kwargs:
+            |  seq (int): last seq already copied, default: None (all)
+            |  attr_list (list): columns to return, default: None (all)
+            |  batch_size (int): if given, yield lists of up to batch_size
+                rows instead of single rows, default: None
+
+        :Yields:
+            |  a [seq] + data list per row (or a list of them per batch)
+
+        >>> with DBWrapper("news.db", key="blake2b") as db:
+        ...     for row in db.iter_data_logged_after("yahoo_news", 52811,
+        ...                                          attr_list=["title"]):
+        ...         print(row)
+        >>>[52812, "yyyy"]
+        """
+        str_attr = self._select_attrs(table_name, attr_list)
+        if str_attr == "*":
+            str_attr = "{}.*".format(table_name)
+        # the log columns are renamed like the side tables in _from_sql()
+        sql = "SELECT {0}_log_seq, {1} FROM {2} JOIN (SELECT seq AS " \
+              "{0}_log_seq, id AS {0}_log_id FROM {0}_log) ON " \
+              "{0}_log_id = {0}.id".format(
+                table_name, str_attr, self._from_sql(table_name, attr_list))
+        parameters = ()
+        if seq is not None:
+            sql += " WHERE {}_log_seq > ?".format(table_name)
+            parameters = (seq, )
+        sql += " ORDER BY {}_log_seq".format(table_name)
+        return self._iter_query(sql, parameters, batch_size)
+
+    def get_table_types(self, table_name):
+        """
+        get declared column types
+
+        :Args:
+            |  table_name (string): table name
+
+        :Returns:
+            |  a dict of column -> upper-cased type, "" for untyped columns
+
+        >>> with DBWrapper() as db:
+        ...     db.get_table_types("yahoo_news")
+        >>> {'id': '', 'title': '', ..., 'pubDate': 'INTEGER', ...}
+        """
+        try:
+            self._cursor.execute("PRAGMA table_info({})".format(table_name))
+            return {row[1]: row[2].upper() for row in self._cursor}
+        except sqlite3.Error as e:
+            self._print_error(e)
+
     def get_count_query_by_time(self,
                                 table_name,
                                 query_list,
                                 start,
                                 end,
                                 attr="pubDate",
-                                query_col="allnews"):
+                                query_col="allnews",
+                                use_fts=False):
         """
-        |  get count of appearance from query list, this will call
-           get_data_by_time()
+        |  get count of appearance from query list, the counting is done
+           inside sqlite so only the total leaves the database
 
         This is a wrapper function for easy using
 
@@ -262,6 +1269,8 @@ class DBWrapper(object):
                 , default: "pubDate"
             |  query_col (string): can be "all", "title", "desc" or "allnews"
                 , default: "allnews"
+            |  use_fts (bool): only count in rows the fts index (see
+                create_fts_index()) finds the query in, default: False
 
         :Returns:
             |  a number of count
@@ -279,28 +1288,408 @@ class DBWrapper(object):
         ...                    query_col="title"   # default is allnews
         ...             )
         """
-        data_list = self.get_data_by_time(table_name, start, end, attr)
+        sql, parameters, from_sql = self._count_query_sql(
+                table_name, query_list, query_col, attr)
+        parameters += [self._time_value(start), self._time_value(end)]
+        try:
+            sql = self._time_range_sql(table_name, attr, sql, from_sql)
+            if use_fts:
+                fts_sql, fts_parameters = self._fts_filter(
+                        table_name, query_list, query_col)
+                if fts_sql:
+                    sql += fts_sql
+                    parameters += fts_parameters
+            self._cursor.execute(sql, parameters)
+            return self._cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            self._print_error(e)
 
-        def get_attr_list(query_col_string):
-            # map to database col number
-            array_num_list = list()
-            if "all" == query_col_string.lower():
-                array_num_list = [1, 2, 5] + array_num_list
-            else:
-                if "title" in query_col_string.lower():
-                    array_num_list.append(1)
-                if "desc" in query_col_string.lower():
-                    array_num_list.append(2)
-                if "allnews" in query_col_string.lower():
-                    array_num_list.append(5)
-            return array_num_list
-
-        count = 0
-        for data in data_list:
-            wanted_col = [data[i] for i in get_attr_list(query_col)]
-            for _ in wanted_col:
-                logging.debug(_)
-                logging.debug("-----------")
-                for q in query_list:
-                    count += str(_).count(q)
-        return count
+    def get_count_query_by_time_buckets(self,
+                                        table_name,
+                                        query_list,
+                                        start,
+                                        end,
+                                        bucket_size,
+                                        attr="pubDate",
+                                        query_col="allnews",
+                                        use_fts=False):
+        """
+        |  histogram version of get_count_query_by_time(), split start to end
+           into windows of bucket_size and count each of them, all in one
+           query
+
+        :Args:
+            |  table_name (string): table name
+            |  query_list (list): list of query words
+            |  start (number): compare value, eg: unix time stamp
+            |  end (number): compare value, eg: unix time stamp
+            |  bucket_size (number): width of each window, eg: 3600 for hours,
+                ValueError if not positive
+
+        :Kwargs:
+            |  attr (string): column you want to compare between start and end
+                , default: "pubDate"
+            |  query_col (string): can be "all", "title", "desc" or "allnews"
+                , default: "allnews"
+            |  use_fts (bool): only count in rows the fts index (see
+                create_fts_index()) finds the query in, default: False
+
+        :Returns:
+            |  a list of count, one per window [start + i * bucket_size,
+               start + (i + 1) * bucket_size)
+
+        >>> with DBWrapper() as db:
+        ...     counts = db.get_count_query_by_time_buckets(
+        ...                    "yahoo_news",
+        ...                    ["金融", "觀察"],
+        ...                    1526196605,
+        ...                    1526197778,
+        ...                    300,
+        ...                    query_col="title"
+        ...             )
+        >>> [3, 0, 1, 2]
+        """
+        if not bucket_size > 0:
+            raise ValueError("bucket_size must be positive, got {}".format(
+                             bucket_size))
+        start = self._time_value(start)
+        end = self._time_value(end)
+        num_buckets = max(int(math.ceil((end - start) / bucket_size)), 0)
+        sql, parameters, from_sql = self._count_query_sql(
+                table_name, query_list, query_col, attr)
+        try:
+            sql = self._time_range_sql(
+                    table_name, attr,
+                    "CAST(({} - ?) / ? AS INTEGER), {}".format(attr, sql),
+                    from_sql)
+            parameters = [start, bucket_size] + parameters + [start, end]
+            if use_fts:
+                fts_sql, fts_parameters = self._fts_filter(
+                        table_name, query_list, query_col)
+                if fts_sql:
+                    sql += fts_sql
+                    parameters += fts_parameters
+            sql += " GROUP BY 1"
+            self._cursor.execute(sql, parameters)
+            counts = [0] * num_buckets
+            for bucket, count in self._cursor:
+                counts[bucket] = count
+            return counts
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+    def create_fts_index(self, table_name, query_col="all"):
+        """
+        |  create a fts5 full text index "<table_name>_fts" over the columns
+           of query_col and index all rows, data_insert() keeps it up to date
+        |  CJK text is indexed as character bigrams, so words of any
+           length (eg: "金融", "台積電") can be found without scanning
+        |  other text is matched by word prefix, so a query starting in the
+           middle of a word (eg: "pple" in "Apple") is not found with it
+        |  the index is contentless, counts are still taken from the
+           original text, it only picks the rows to look at
+
+        :Args:
+            |  table_name (string): table name
+
+        :Kwargs:
+            |  query_col (string): can be "all", "title", "desc" or "allnews"
+                , default: "all"
+
+        >>> with DBWrapper("news.db") as db:
+        ...     db.create_fts_index("yahoo_news")
+        ...     count = db.get_count_query_by_time(
+        ...                    "yahoo_news", ["金融", "觀察"],
+        ...                    1526196605, 1526197778,
+        ...                    use_fts=True)
+        """
+        col_list = self._get_query_col_list(table_name, query_col)
+        try:
+            sql = "CREATE VIRTUAL TABLE IF NOT EXISTS {}_fts USING fts5({}, " \
+                  "content='', tokenize='unicode61')".format(
+                    table_name, ",".join(col_list))
+            self._cursor.execute(sql)
+        except sqlite3.Error as e:
+            self._print_error(e)
+            return
+        self._fts_tables[table_name] = True
+        self._sync_fts_index(table_name)
+
+    def _has_fts_index(self, table_name):
+        if table_name not in self._fts_tables:
+            self._cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name = ?",
+                ("{}_fts".format(table_name), ))
+            self._fts_tables[table_name] = self._cursor.fetchone()[0] > 0
+        return self._fts_tables[table_name]
+
+    def _sync_fts_index(self, table_name, keys=None):
+        # with md5 ids sqlite picks the rowid and only ever appends, so
+        # index everything past the highest rowid already in the index,
+        # integer ids are the rowid and spread over its whole range, so
+        # index the rows (of keys, if given) the index does not have yet
+        try:
+            self._cursor.execute("SELECT * FROM {}_fts LIMIT 0".format(
+                                 table_name))
+            col_list = [d[0] for d in self._cursor.description]
+            sql = "INSERT INTO {0}_fts (rowid, {1}) SELECT {0}.rowid, {2} " \
+                  "FROM {3} WHERE ".format(
+                    table_name, ",".join(col_list),
+                    ",".join(["fts_bigrams({})".format(
+                              self._col_sql(table_name, c))
+                              for c in col_list]),
+                    self._from_sql(table_name, col_list))
+            if self._key == "md5":
+                self._cursor.execute(
+                        sql + "{0}.rowid > (SELECT IFNULL(MAX(rowid), 0) "
+                        "FROM {0}_fts)".format(table_name))
+                return
+            sql += "NOT EXISTS (SELECT 1 FROM {0}_fts " \
+                   "WHERE rowid = {0}.rowid)".format(table_name)
+            if keys is None:
+                self._cursor.execute(sql)
+                return
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                self._cursor.execute(
+                        sql + " AND {}.rowid IN ({})".format(
+                            table_name, ",".join(["?"] * len(chunk))), chunk)
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+    def _fts_filter(self, table_name, query_list, query_col):
+        # sql and parameters restricting a query to the rows the fts index
+        # says contain one of query_list, or None if it can not tell
+        phrases = [fts_phrase(q) for q in query_list if q]
+        if not phrases or None in phrases:
+            return None, []
+        col_list = self._get_query_col_list(table_name, query_col)
+        match = "{{{}}} : ({})".format(" ".join(col_list),
+                                        " OR ".join(phrases))
+        sql = " and {0}.rowid IN (SELECT rowid FROM {0}_fts WHERE {0}_fts " \
+              "MATCH ?)".format(table_name)
+        return sql, [match]
+
+    def _get_query_col_list(self, table_name, query_col_string):
+        # map to database col number, then to its name
+        array_num_list = list()
+        if "all" == query_col_string.lower():
+            array_num_list = [1, 2, 5] + array_num_list
+        else:
+            if "title" in query_col_string.lower():
+                array_num_list.append(1)
+            if "desc" in query_col_string.lower():
+                array_num_list.append(2)
+            if "allnews" in query_col_string.lower():
+                array_num_list.append(5)
+        attrs_list = self.get_table_attrs_list(table_name)
+        return [attrs_list[i] for i in array_num_list]
+
+    def _count_query_sql(self, table_name, query_list, query_col, attr):
+        # occurrences of q in a column are
+        # (length(col) - length(replace(col, q, ''))) / length(q),
+        # the same non-overlapping count as str.count(q), returns the sql,
+        # its parameters and the FROM clause it needs
+        terms = list()
+        parameters = list()
+        col_list = self._get_query_col_list(table_name, query_col)
+        for col in col_list:
+            text = "IFNULL(CAST({} AS TEXT), '')".format(
+                    self._col_sql(table_name, col))
+            for q in query_list:
+                if not q:
+                    continue
+                terms.append("(length({0}) - length(replace({0}, ?, ''))) "
+                             "/ length(?)".format(text))
+                parameters += [q, q]
+        expression = " + ".join(terms) or "0"
+        return "IFNULL(SUM({}), 0)".format(expression), parameters, \
+            self._from_sql(table_name, col_list)
+
+
+class ThreadedDBWrapper(DBWrapper):
+    """
+        DBWrapper that can be shared by many threads
+
+        |  every thread gets its own connection the first time it touches
+           the db and keeps it until close, readers run in parallel under
+           WAL and never hold a transaction open
+        |  data_insert() only queues the rows, one writer thread takes
+           whatever the fetcher threads queued and writes it in one
+           transaction, so they never wait on each other for the db lock
+        |  db_name must be a file, every ":memory:" connection is a
+           different database
+    """
+    def __init__(self, db_name, key="md5", seen_ids=False, batch_rows=5000,
+                 queue_size=1000, timeout=30):
+        """
+        :Args:
+            |  db_name (string): db file name
+
+        :Kwargs:
+            |  key (string): see DBWrapper, default: "md5"
+            |  seen_ids (bool): see DBWrapper, default: False
+            |  batch_rows (int): rows the writer tries to put in one
+                transaction, default: 5000
+            |  queue_size (int): data_insert() calls that can wait for the
+                writer before the next one blocks, default: 1000
+            |  timeout (float): seconds a connection waits for a lock,
+                default: 30
+
+        >>> with ThreadedDBWrapper("news.db") as db:
+        ...     db.create_table("yahoo_news", ["title", "pubDate"])
+        ...     crawlers = [threading.Thread(target=crawl, args=(db, url))
+        ...                 for url in urls]
+        ...     for t in crawlers:
+        ...         t.start()
+        ...     # readers can query db from any thread meanwhile
+        ...     for t in crawlers:
+        ...         t.join()
+        """
+        self._db_name = db_name
+        self._timeout = timeout
+        self._batch_rows = batch_rows
+        self._local = threading.local()
+        self._conns = list()
+        self._conns_lock = threading.Lock()
+        self._queue = queue.Queue(queue_size)
+        self._setup(key, seen_ids)
+
+        # WAL is switched on by the writer before any reader connects
+        ready = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop,
+                                        args=(ready, ),
+                                        name="ThreadedDBWrapper writer",
+                                        daemon=True)
+        self._writer.start()
+        ready.wait()
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit, a reader never keeps the write lock
+            conn = self._open(isolation_level=None)
+        return conn
+
+    @property
+    def _cursor(self):
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._conn.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def _open(self, **kwargs):
+        # check_same_thread off only so close() can close them all,
+        # each connection is still used by the thread that opened it
+        conn = self._connect(self._db_name, timeout=self._timeout,
+                             check_same_thread=False, **kwargs)
+        with self._conns_lock:
+            self._conns.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def _write_loop(self, ready):
+        conn = self._open()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            self._print_error(e)
+        ready.set()
+
+        while True:
+            # block for the first task, then take what else is queued
+            tasks = [self._queue.get()]
+            rows = len(tasks[0][2]) if tasks[0] else 0
+            while tasks[-1] is not None and rows < self._batch_rows:
+                try:
+                    task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                tasks.append(task)
+                if task is not None:
+                    rows += len(task[2])
+
+            try:
+                self._write(conn, [t for t in tasks if t is not None])
+            finally:
+                for _ in tasks:
+                    self._queue.task_done()
+            if tasks[-1] is None:
+                break
+
+    def _write(self, conn, tasks):
+        # all tasks in one transaction, if that fails it is rolled back
+        # and the tasks are written one by one, so a bad row only loses
+        # the data_insert() call it came with, and the writer keeps going
+        try:
+            for task in tasks:
+                self._data_insert(*task)
+            conn.commit()
+            return
+        except Exception:
+            logging.exception("writing a batch of {} inserts failed, "
+                              "retrying them one by one".format(len(tasks)))
+            self._rollback(conn, tasks)
+        for task in tasks:
+            try:
+                self._data_insert(*task)
+                conn.commit()
+            except Exception:
+                logging.exception("dropped {} rows for {}".format(
+                                  len(task[2]), task[0]))
+                self._rollback(conn, [task])
+
+    def _rollback(self, conn, tasks):
+        try:
+            conn.rollback()
+        except sqlite3.Error as e:
+            self._print_error(e)
+        # the seen sets of the tables may hold ids of rows rolled back,
+        # they are read from the tables again on the next insert
+        if self._seen is not None:
+            for task in tasks:
+                self._seen.pop(task[0], None)
+
+    def data_insert(self, table_name, attr_list, values_list):
+        """
+        |  queue values_list for the writer thread and return at once,
+           see DBWrapper.data_insert()
+        |  call flush() before reading the rows back
+        |  if the rows can not be written (eg: a row without a first value
+           to make the id from) the error is logged and this call's rows
+           are dropped, rows of other calls are still written
+
+        :Args:
+            |  table_name (string): table name
+            |  attr_list (list): table header
+            |  values_list (list): list of values list you want to insert
+
+        >>> def crawl(db, url):
+        ...     db.data_insert("yahoo_news", ["title", "pubDate"],
+        ...                    fetch_news(url))
+        """
+        self._queue.put((table_name, list(attr_list), list(values_list)))
+
+    def flush(self):
+        """
+        block until the writer thread has committed everything queued
+        """
+        self._queue.join()
+
+    def _commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self._print_error(e)
+
+    def _close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = list()
@@ -169,22 +169,39 @@ class LancasterStemmer(StemmerI):
         """
         # Setup an empty rule dictionary - this will be filled in later
         self.rule_dictionary = {}
+        self.rule_records = {}
 
     def parseRules(self, rule_tuple):
-        """Validate the set of rules used in this stemmer.
+        """Validate the set of rules used in this stemmer, and split each
+        one into a (word ending, intact flag, remove total, append string,
+        stop flag) record so stemming never has to parse a rule again.
         """
-        valid_rule = re.compile("^[a-z]+\*?\d[a-z]*[>\.]?$")
+        valid_rule = re.compile("^([a-z]+)(\*?)(\d)([a-z]*)([>\.]?)$")
         # Empty any old rules from the rule set before adding new ones
         self.rule_dictionary = {}
+        self.rule_records = {}
 
         for rule in rule_tuple:
-            if not valid_rule.match(rule):
+            rule_match = valid_rule.match(rule)
+            if not rule_match:
                 raise ValueError, "The rule %s is invalid" % rule
+            (ending_string,
+             intact_flag,
+             remove_total,
+             append_string,
+             cont_flag) = rule_match.groups()
+            record = (ending_string[::-1],
+                      bool(intact_flag),
+                      int(remove_total),
+                      append_string,
+                      cont_flag == '.')
             first_letter = rule[0:1]
             if first_letter in self.rule_dictionary:
                 self.rule_dictionary[first_letter].append(rule)
+                self.rule_records[first_letter].append(record)
             else:
                 self.rule_dictionary[first_letter] = [rule]
+                self.rule_records[first_letter] = [record]
 
     def stem(self, word):
         """Stem a word using the Lancaster stemmer.
@@ -205,8 +222,6 @@ class LancasterStemmer(StemmerI):
         """Perform the actual word stemming
         """
 
-        valid_rule = re.compile("^([a-z]+)(\*?)(\d)([a-z]*)([>\.]?)$")
-
         proceed = True
 
         while proceed:
@@ -215,46 +230,39 @@ class LancasterStemmer(StemmerI):
             last_letter_position = self.__getLastLetter(word)
 
             # Only stem the word if it has a last letter and a rule matching that last letter
-            if last_letter_position < 0 or word[last_letter_position] not in self.rule_dictionary:
+            if last_letter_position < 0 or word[last_letter_position] not in self.rule_records:
                 proceed = False
 
             else:
                 rule_was_applied = False
 
                 # Go through each rule that matches the word's final letter
-                for rule in self.rule_dictionary[word[last_letter_position]]:
-                    rule_match = valid_rule.match(rule)
-                    if rule_match:
-                        (ending_string,
-                         intact_flag,
-                         remove_total,
-                         append_string,
-                         cont_flag) = rule_match.groups()
-
-                        # Convert the number of chars to remove when stemming
-                        # from a string to an integer
-                        remove_total = int(remove_total)
-
-                        # Proceed if word's ending matches rule's word ending
-                        if word.endswith(ending_string[::-1]):
-                            if intact_flag:
-                                if (word == intact_word and
-                                    self.__isAcceptable(word, remove_total)):
-                                    word = self.__applyRule(word,
-                                                            remove_total,
-                                                            append_string)
-                                    rule_was_applied = True
-                                    if cont_flag == '.':
-                                        proceed = False
-                                    break
-                            elif self.__isAcceptable(word, remove_total):
+                for (ending,
+                     intact_flag,
+                     remove_total,
+                     append_string,
+                     stop) in self.rule_records[word[last_letter_position]]:
+
+                    # Proceed if word's ending matches rule's word ending
+                    if word.endswith(ending):
+                        if intact_flag:
+                            if (word == intact_word and
+                                self.__isAcceptable(word, remove_total)):
                                 word = self.__applyRule(word,
                                                         remove_total,
                                                         append_string)
                                 rule_was_applied = True
-                                if cont_flag == '.':
+                                if stop:
                                     proceed = False
                                 break
+                        elif self.__isAcceptable(word, remove_total):
+                            word = self.__applyRule(word,
+                                                    remove_total,
+                                                    append_string)
+                            rule_was_applied = True
+                            if stop:
+                                proceed = False
+                            break
                 # If no rules apply, the word doesn't need any more stemming
                 if rule_was_applied == False:
                     proceed = False
@@ -92,11 +92,17 @@ __docformat__ = 'plaintext'
 
 import sys
 import re
+import threading
+from collections import namedtuple, OrderedDict
 
 ## --NLTK--
 ## Import the nltk.stemmer module, which defines the stemmer interface
 from api import StemmerI
 
+## --CACHE--
+## Same fields as functools.lru_cache().cache_info()
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
 class PorterStemmer(StemmerI):
 
     ## --NLTK--
@@ -112,6 +118,10 @@ class PorterStemmer(StemmerI):
     information.
 
     The Porter Stemmer requires that all tokens have string types.
+
+    With cache_size > 0, stem() memoizes results in a thread-safe LRU
+    cache of that many words and computes misses with stem_reentrant(),
+    so one stemmer can be shared by a thread pool.
     """
 
     # The main part of the stemming algorithm starts here.
@@ -122,7 +132,7 @@ class PorterStemmer(StemmerI):
     # Note that only lower case sequences are stemmed. Forcing to lower case
     # should be done before stem(...) is called.
 
-    def __init__(self):
+    def __init__(self, cache_size=0):
 
         self.b = ""  # buffer for word to be stemmed
         self.k = 0
@@ -169,6 +179,14 @@ class PorterStemmer(StemmerI):
             for val in irregular_forms[key]:
                 self.pool[val] = key
 
+        ## --CACHE--
+        ## Bounded LRU cache of computed stems, see stem().
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def cons(self, i):
         """cons(i) is TRUE <=> b[i] is a consonant."""
         if self.b[i] == 'a' or self.b[i] == 'e' or self.b[i] == 'i' or self.b[i] == 'o' or self.b[i] == 'u':
@@ -553,9 +571,57 @@ class PorterStemmer(StemmerI):
     ## --NLTK--
     ## Define a stem() method that implements the StemmerI interface.
     def stem(self, word):
+        ## --CACHE--
+        ## Serve repeated words from the LRU cache when it is enabled.
+        if self.cache_size > 0:
+            return self._cached_stem(word)
         stem = self.stem_word(word.lower(), 0, len(word) - 1)
         return self.adjust_case(word, stem)
 
+    ## --CACHE--
+    ## A reentrant stem() and the LRU cache built on top of it.
+    def stem_reentrant(self, word):
+        """
+        Like stem(), but the b/k/k0/j buffers live in a throwaway
+        worker instead of self, so concurrent calls cannot interfere.
+        """
+        worker = self.__class__.__new__(self.__class__)
+        worker.pool = self.pool
+        stem = worker.stem_word(word.lower(), 0, len(word) - 1)
+        return self.adjust_case(word, stem)
+
+    def _cached_stem(self, word):
+        with self._cache_lock:
+            try:
+                stem = self._cache.pop(word)
+            except KeyError:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+                self._cache[word] = stem
+                return stem
+
+        stem = self.stem_reentrant(word)
+
+        with self._cache_lock:
+            self._cache[word] = stem
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return stem
+
+    def cache_info(self):
+        """Return a CacheInfo of the stem cache statistics."""
+        with self._cache_lock:
+            return CacheInfo(self.cache_hits, self.cache_misses,
+                             self.cache_size, len(self._cache))
+
+    def cache_clear(self):
+        """Empty the stem cache and reset its statistics."""
+        with self._cache_lock:
+            self._cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+
     ## --NLTK--
     ## Add a string representation function
     def __repr__(self):
@@ -31,6 +31,10 @@
 # e/ou melhor para o português. Também sugiro utilizar-se a lista de discussão
 # do NLTK para o português para qualquer debate.
 
+import hashlib
+import os
+import pickle
+
 from nltk.data import load
 
 from api import StemmerI
@@ -52,16 +56,75 @@ class RSLPStemmer(StemmerI):
         uma cas de port e janel , em cim dum coxilh .
     """
 
-    def __init__ (self):
-        self._model = []
-
-        self._model.append( self.read_rule("step0.pt") )
-        self._model.append( self.read_rule("step1.pt") )
-        self._model.append( self.read_rule("step2.pt") )
-        self._model.append( self.read_rule("step3.pt") )
-        self._model.append( self.read_rule("step4.pt") )
-        self._model.append( self.read_rule("step5.pt") )
-        self._model.append( self.read_rule("step6.pt") )
+    # rule files of the seven steps
+    STEP_FILES = ["step%d.pt" % i for i in range(7)]
+    # bump when the layout of the compiled rules changes
+    CACHE_VERSION = 1
+
+    # compiled rules shared by every instance in this process, by
+    # cache_file, each with the version of the rule files it came from
+    _compiled = {}
+
+    def __init__ (self, cache_file=None):
+        """
+        The seven step rule sets are compiled into suffix tries once per
+        process. If cache_file is given, the parsed and compiled rules are
+        read from that pickle when it was made from the same rule files,
+        and written to it otherwise, so later processes skip read_rule()
+        altogether.
+        """
+        version = self.rules_version()
+        cached = RSLPStemmer._compiled.get(cache_file)
+        if cached is None or cached[0] != version:
+            cached = (version, self._load_compiled(cache_file, version))
+            RSLPStemmer._compiled[cache_file] = cached
+        self._model, self._tries = cached[1]
+
+    def rules_version(self):
+        """
+        The cache version and a hash of the rule files, an edited rule
+        file gives a different version.
+        """
+        digest = hashlib.md5()
+        for filename in self.STEP_FILES:
+            digest.update(load('nltk:stemmers/rslp/' + filename,
+                               format='raw'))
+        return (self.CACHE_VERSION, digest.hexdigest())
+
+    def _load_compiled(self, cache_file, version):
+        if cache_file is not None and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'rb') as f:
+                    cached = pickle.load(f)
+                if cached[0] == version:
+                    return cached[1]
+            except (pickle.UnpicklingError, EOFError, ValueError,
+                    TypeError, IndexError, KeyError, AttributeError):
+                pass   # written by another version, built again below
+
+        model = [self.read_rule(filename) for filename in self.STEP_FILES]
+        compiled = (model, [self.compile_rules(rules) for rules in model])
+
+        if cache_file is not None:
+            with open(cache_file, 'wb') as f:
+                pickle.dump((version, compiled), f, pickle.HIGHEST_PROTOCOL)
+        return compiled
+
+    def compile_rules (self, rules):
+        """
+        Build a trie over the reversed suffixes of one step. Each node maps
+        a letter to its child, and the None key holds the rules ending
+        there as (order, suffix length, minimum stem size, replacement,
+        exceptions) with exceptions as a frozenset.
+        """
+        trie = {}
+        for order, rule in enumerate(rules):
+            node = trie
+            for char in reversed(rule[0]):
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(
+                (order, len(rule[0]), rule[1], rule[2], frozenset(rule[3])) )
+        return trie
 
     def read_rule (self, filename):
         rules = load('nltk:stemmers/rslp/' + filename, format='raw').decode("utf8")
@@ -127,14 +190,27 @@ class RSLPStemmer(StemmerI):
         return word
 
     def apply_rule(self, word, rule_index):
-        rules = self._model[rule_index]
-        for rule in rules:
-            suffix_length = len(rule[0])
-            if word[-suffix_length:] == rule[0]:       # if suffix matches
-                if len(word) >= suffix_length + rule[1]: # if we have minimum size
-                    if word not in rule[3]:                # if not an exception
-                        word = word[:-suffix_length] + rule[2]
-                        break
+        node = self._tries[rule_index]
+
+        # collect the rules whose suffix matches, walking the word backwards;
+        # an empty suffix only ever matched the empty word
+        if word:
+            candidates = []
+        else:
+            candidates = list(node.get(None, ()))
+        for char in reversed(word):
+            node = node.get(char)
+            if node is None:
+                break
+            candidates.extend(node.get(None, ()))
+
+        # first matching rule in file order wins, as before
+        if len(candidates) > 1:
+            candidates.sort()
+        for order, suffix_length, min_size, replacement, exceptions in candidates:
+            if len(word) >= suffix_length + min_size: # if we have minimum size
+                if word not in exceptions:              # if not an exception
+                    return word[:-suffix_length] + replacement
 
         return word
 
@@ -10,6 +10,18 @@ FINANCE_TABLES = {
     'sectors': 'yahoo.finance.sectors',
     'industry': 'yahoo.finance.industry'
 }
+# seconds a YQL response stays fresh in response_cache.ResponseCache,
+# by the table it selects from
+CACHE_TTLS = {
+    'yahoo.finance.quotes': 60,
+    'yahoo.finance.quoteslist': 60,
+    'yahoo.finance.options': 60,
+    'yahoo.finance.sectors': 24 * 60 * 60,
+    'yahoo.finance.industry': 24 * 60 * 60,
+    'rss': 15 * 60,
+    'csv': 60 * 60,
+}
+CACHE_DEFAULT_TTL = 60
 
 # for chineseStockRetriever.py use
 RSS_CH_STOCK_SEARCH_URL = 'http://tw.stock.yahoo.com/rss/q/'
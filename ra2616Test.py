@@ -1,57 +1,290 @@
 from __future__ import division
 from math import log
+import os
 import sys
 import json
 import re
+import time
+import numpy as np
+import compiled_model
 import porter
-stemmer = porter.PorterStemmer()
+# news text repeats a lot, so stems are memoized
+STEM_CACHE_SIZE = 50000
+stemmer = porter.PorterStemmer(cache_size=STEM_CACHE_SIZE)
+
+_dropped = re.compile("[',.]")
+_separator = re.compile("\s|(?<!\d)[^\w']+|[^\w']+(?!\d)")
+
+def iter_tokens(words):
+    """Yield the stemmed tokens of words one at a time from a single scan."""
+    words = _dropped.sub('', words).lower()
+    start = 0
+    for match in _separator.finditer(words):
+        yield stemmer.stem(words[start:match.start()])
+        start = match.end()
+    yield stemmer.stem(words[start:])
 
 def tokenizer(words):
-    words = words.replace('\'','').replace(',','').replace('.','')
-    temp = re.split("\s|(?<!\d)[^\w']+|[^\w']+(?!\d)", words.lower())
-    return [stemmer.stem(i) for i in temp]
+    return list(iter_tokens(words))
 
 modelFile = 'model.json'
 
-def getSentiment(test):
-    n = 1
-    test = [test]
-    #test = ['so bad, so sad, its a sad sad situation and its getting more and more absurd; ; ']
-    #test = ['so good, so happy, its a sad and bad situation and its getting more and more wonderful; ; ']
-
-    with open(modelFile, 'r') as fp: 
-        prob,sorted_features = json.load(fp)
-
-    num_features = len(prob)
-    y_pred = [0 for i in range(n)]
-    x = [ [0 for i in range(num_features)] for j in range(n) ]
-    for i,data in enumerate(test):
-        datarow =  data[1:-1]
-        #print datarow.encode('utf-8')
-        tokenized = tokenizer(datarow)
-        #print tokenized
-        for token in tokenized:
-            if token in sorted_features:
-                x[i][sorted_features.index(token)] = 1
-        for j in range(len(tokenized)-1):
-            token = ' '.join((tokenized[j], tokenized[j+1]))
-            if token in sorted_features:
-                x[i][sorted_features.index(token)] = 1
-                
-    for i in range(n):
+# margins closer to zero than this are re-scored with the original
+# sequential sum so that ties break exactly like the dense loop did
+TIE_TOLERANCE = 1e-9
+
+
+class SentimentModel(object):
+    """
+    Bernoulli naive Bayes model from model.json, loaded once.
+
+    log(p) and log(1-p) are precomputed for both classes, so a document
+    is scored as the "all features absent" baseline plus the deltas of
+    the features it actually contains.
+    """
+
+    def __init__(self, prob, sorted_features, log_p=None, log_q=None):
+        self.prob = prob
+        self.sorted_features = sorted_features
+        self.num_features = len(prob)
+
+        # feature -> column, first occurrence wins like list.index();
+        # bigrams are keyed by their (first, second) token pair so that
+        # scoring never has to build the joined string
+        self.feature_index = {}
+        self.unigram_index = {}
+        self.bigram_index = {}
+        for j, feature in enumerate(sorted_features):
+            self.feature_index.setdefault(feature, j)
+            tokens = feature.split(' ')
+            if len(tokens) == 1:
+                self.unigram_index.setdefault(feature, j)
+            elif len(tokens) == 2:
+                self.bigram_index.setdefault(tuple(tokens), j)
+
+        if log_p is None or log_q is None:
+            p = np.array(prob, dtype=np.float64).reshape(-1, 2)
+            log_p = np.log(p)
+            log_q = np.log(1 - p)
+        self.log_p = log_p
+        self.log_q = log_q
+        self.delta = self.log_p - self.log_q
+        self.baseline = self.log_q.sum(axis=0)
+
+    @classmethod
+    def load(cls, filename=modelFile):
+        with open(filename, 'r') as fp:
+            prob, sorted_features = json.load(fp)
+        return cls(prob, sorted_features)
+
+    @classmethod
+    def load_compiled(cls, filename=compiled_model.compiledFile):
+        """Load from the memory-mapped output of compiled_model.py."""
+        model = compiled_model.CompiledModel(filename)
+        return cls(model.feature_prob, model.features(),
+                   model.feature_log_p, model.feature_log_q)
+
+    def feature_ids(self, text):
+        """Yield the column of every unigram and bigram of text in the model."""
+        unigrams = self.unigram_index
+        bigrams = self.bigram_index
+        previous = None
+        for token in iter_tokens(text):
+            if token in unigrams:
+                yield unigrams[token]
+            if previous is not None and (previous, token) in bigrams:
+                yield bigrams[(previous, token)]
+            previous = token
+
+    def features(self, text):
+        """Return the sorted column indices of unigrams and bigrams present."""
+        return sorted(set(self.feature_ids(text)))
+
+    def loglikelihood(self, columns):
+        """Return (neglikhood, poslikhood) for the given present columns."""
+        if not columns:
+            return self.baseline
+        return self.baseline + self.delta[columns].sum(axis=0)
+
+    def _sequential_label(self, columns):
+        # the original dense loop, summed in feature order
+        present = set(columns)
+        prob = self.prob
         poslikhood = 0
         neglikhood = 0
-        for j in range(num_features):
-            if x[i][j] == 1:
+        for j in range(self.num_features):
+            if j in present:
                 poslikhood += log(prob[j][1])
                 neglikhood += log(prob[j][0])
-            if x[i][j] == 0:
+            else:
                 poslikhood += log( 1 - prob[j][1] )
                 neglikhood += log( 1 - prob[j][0] )
-                
-            if poslikhood > neglikhood:
-                y_pred[i] = 1
-            else:
-                y_pred[i] = 0
-        #print 'good 1 or bad 0, ', y_pred[i]
-        return y_pred[i]
+        return 1 if poslikhood > neglikhood else 0
+
+    def label(self, columns):
+        if not self.num_features:
+            return 0
+        neglikhood, poslikhood = self.loglikelihood(columns)
+        margin = poslikhood - neglikhood
+        if abs(margin) < TIE_TOLERANCE:
+            return self._sequential_label(columns)
+        return 1 if margin > 0 else 0
+
+    def score(self, text):
+        """Return 1 for positive and 0 for negative."""
+        return self.label(self.features(text))
+
+    def matrix(self, texts):
+        """
+        Tokenize texts into a CSR-style binary document x feature matrix.
+
+        Returns (indptr, indices): the present columns of document i are
+        indices[indptr[i]:indptr[i+1]].
+        """
+        indptr = [0]
+        indices = []
+        for text in texts:
+            indices.extend(self.features(text))
+            indptr.append(len(indices))
+        return (np.array(indptr, dtype=np.intp),
+                np.array(indices, dtype=np.intp))
+
+    def score_batch(self, texts):
+        """
+        Score many documents with one sparse matrix product.
+
+        Returns (labels, margins) arrays where margins are
+        poslikhood - neglikhood and labels are 1 for positive.
+        """
+        indptr, indices = self.matrix(texts)
+        n = len(indptr) - 1
+        if n == 0:
+            return np.zeros(0, dtype=np.int8), np.zeros(0)
+        # numpy before 1.8 can not bincount an empty array
+        sums = np.zeros((n, 2))
+        if len(indices):
+            rows = np.repeat(np.arange(n), np.diff(indptr))
+            delta = self.delta[indices]
+            for c in range(2):
+                sums[:, c] = np.bincount(rows, weights=delta[:, c],
+                                         minlength=n)
+        neglikhood = self.baseline[0] + sums[:, 0]
+        poslikhood = self.baseline[1] + sums[:, 1]
+        margins = poslikhood - neglikhood
+        labels = (margins > 0).astype(np.int8)
+        if not self.num_features:
+            labels[:] = 0
+        for i in np.flatnonzero(np.abs(margins) < TIE_TOLERANCE):
+            columns = indices[indptr[i]:indptr[i+1]]
+            labels[i] = self._sequential_label(columns)
+        return labels, margins
+
+
+_model = None
+
+def load_model(filename=modelFile,
+               compiled=compiled_model.compiledFile):
+    """Load the compiled model when it is up to date, else filename."""
+    if (os.path.exists(compiled) and
+            os.path.getmtime(compiled) >= os.path.getmtime(filename)):
+        return SentimentModel.load_compiled(compiled)
+    return SentimentModel.load(filename)
+
+def get_model():
+    """Return the shared SentimentModel, loading modelFile on first use."""
+    global _model
+    if _model is None:
+        _model = load_model(modelFile)
+    return _model
+
+def getSentiment(test):
+    #test = 'so bad, so sad, its a sad sad situation and its getting more and more absurd; ; '
+    #test = 'so good, so happy, its a sad and bad situation and its getting more and more wonderful; ; '
+    datarow = test[1:-1]
+    #print datarow.encode('utf-8')
+    y_pred = get_model().score(datarow)
+    #print 'good 1 or bad 0, ', y_pred
+    return y_pred
+
+def score_batch(texts):
+    """
+    Batch version of getSentiment, returns (labels, margins) arrays.
+    Texts get the same preprocessing as getSentiment, so labels match it.
+    """
+    return get_model().score_batch([test[1:-1] for test in texts])
+
+def _init_worker(filename):
+    # runs once per pool process, so every task reuses the same model
+    global modelFile, _model
+    modelFile = filename
+    _model = load_model(filename)
+
+def _score_chunk(texts):
+    start = time.time()
+    labels, margins = score_batch(texts)
+    return labels.tolist(), margins.tolist(), time.time() - start
+
+def score_parallel(texts, processes=None, chunksize=None,
+                   chunk_seconds=0.2, max_chunksize=5000):
+    """
+    Score an iterable of texts on a process pool, yielding
+    (label, margin) pairs in input order.
+
+    texts is consumed lazily, at most two chunks per worker are in
+    flight, so a database cursor can feed it without loading everything
+    into memory. Unless chunksize is given, it is tuned from the measured
+    scoring time so that each chunk takes about chunk_seconds.
+    """
+    import collections
+    import itertools
+    import multiprocessing
+
+    processes = processes or multiprocessing.cpu_count()
+    size = chunksize or 64
+    texts = iter(texts)
+    pool = multiprocessing.Pool(processes, _init_worker, (modelFile,))
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < 2 * processes:
+                chunk = list(itertools.islice(texts, size))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(_score_chunk, (chunk,)))
+            if not pending:
+                break
+            labels, margins, seconds = pending.popleft().get()
+            for result in zip(labels, margins):
+                yield result
+            if chunksize is None and labels:
+                per_doc = seconds / len(labels)
+                if per_doc > 0:
+                    size = int(min(max(chunk_seconds / per_doc, 1),
+                                   max_chunksize))
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def benchmark(n=2000, words=30, repeat=3, seed=0):
+    """Compare docs/sec of getSentiment and score_batch on a synthetic corpus."""
+    import random
+    import timeit
+    vocabulary = get_model().sorted_features
+    rnd = random.Random(seed)
+    texts = [' '.join(rnd.choice(vocabulary) for _ in range(words))
+             for _ in range(n)]
+    single = min(timeit.repeat(lambda: [getSentiment(t) for t in texts],
+                               number=1, repeat=repeat))
+    batch = min(timeit.repeat(lambda: score_batch(texts),
+                              number=1, repeat=repeat))
+    return {'docs': n, 'single_docs_per_sec': n / single,
+            'batch_docs_per_sec': n / batch}
+'''
+good test cases
+washington fun
+'''
+
+if __name__ == '__main__':
+    for name, value in sorted(benchmark().items()):
+        print('%s: %s' % (name, value))
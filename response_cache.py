@@ -0,0 +1,222 @@
+"""
+TTL cache of YQL responses for YQLQuery.execute.
+
+Responses with results are kept by their normalized YQL string, for as
+long as param.CACHE_TTLS says for the table the query selects from.
+Within stale_ttl seconds after that, the old response is still returned
+while a background thread fetches a new one (stale-while-revalidate).
+
+    cache = ResponseCache(MemoryCache(maxsize=1024))
+    stocks = StockRetriever(cache=cache)
+    stocks.get_industry_ids()       # from the network
+    stocks.get_industry_ids()       # from the cache for a day
+    cache.stats()['hit_rate']
+
+MemoryCache is an LRU in the process, SQLiteCache a file that is shared
+by processes and kept across restarts.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from param import CACHE_TTLS, CACHE_DEFAULT_TTL
+
+_FROM = re.compile(r'\bfrom\s+([\w.]+)', re.IGNORECASE)
+
+
+def normalize_yql(yql):
+    """The cache key of yql, the same query with any spacing."""
+    return ' '.join(yql.split())
+
+
+def yql_table(yql):
+    """Name of the table yql selects from, or None."""
+    match = _FROM.search(yql)
+    return match.group(1).lower() if match else None
+
+
+def has_results(text):
+    """Whether text is a YQL response with results, the only ones kept.
+
+    A query that matched nothing or failed ("results": null, or an
+    "error" object) is asked again next time."""
+    try:
+        response = json.loads(text)
+    except ValueError:
+        return False
+    if not isinstance(response, dict) or 'error' in response:
+        return False
+    query = response.get('query')
+    return isinstance(query, dict) and query.get('results') is not None
+
+
+class MemoryCache(object):
+    """LRU of at most maxsize responses, safe to share between threads."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (text, stored_at) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, text, stored_at):
+        with self._lock:
+            self._entries[key] = (text, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(object):
+    """Responses in a sqlite file, safe to share between threads."""
+
+    def __init__(self, filename='yql_cache.db'):
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS yql_cache '
+                               '(key TEXT PRIMARY KEY, text TEXT, '
+                               'stored_at REAL)')
+            self._conn.commit()
+
+    def get(self, key):
+        """Returns (text, stored_at) or None."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT text, stored_at FROM yql_cache WHERE key = ?',
+                (key,)).fetchone()
+
+    def set(self, key, text, stored_at):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO yql_cache '
+                               '(key, text, stored_at) VALUES (?, ?, ?)',
+                               (key, text, stored_at))
+            self._conn.commit()
+
+    def prune(self, older_than):
+        """Deletes the responses stored before the time older_than."""
+        with self._lock:
+            self._conn.execute('DELETE FROM yql_cache WHERE stored_at < ?',
+                               (older_than,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM yql_cache')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT count(*) FROM yql_cache').fetchone()[0]
+
+
+class ResponseCache(object):
+    """TTL and stale-while-revalidate policy over a cache backend.
+
+    ttls maps table names to seconds (param.CACHE_TTLS), other tables get
+    default_ttl. A response older than its ttl but younger than ttl +
+    stale_ttl is still returned while it is fetched again in the
+    background, on every lookup until the new one is stored. clock is
+    time.time, replaceable for tests."""
+
+    def __init__(self, backend=None, ttls=None, default_ttl=CACHE_DEFAULT_TTL,
+                 stale_ttl=0, clock=time.time):
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def ttl(self, yql):
+        """Seconds a response to yql stays fresh."""
+        return self.ttls.get(yql_table(yql), self.default_ttl)
+
+    def fetch(self, yql, fetch):
+        """Returns the text of the response to yql.
+
+        fetch(yql) is called on a miss and must return (status, text),
+        only status 200 responses with results (see has_results) are
+        kept."""
+
+        key = normalize_yql(yql)
+        entry = self.backend.get(key)
+        if entry is not None:
+            text, stored_at = entry
+            age = self.clock() - stored_at
+            ttl = self.ttl(yql)
+            if age < ttl:
+                self._count('hits')
+                return text
+            if age < ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh(key, yql, fetch)
+                return text
+        self._count('misses')
+        return self._fetch(key, yql, fetch)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _fetch(self, key, yql, fetch):
+        status, text = fetch(yql)
+        if status == 200 and has_results(text):
+            self.backend.set(key, text, self.clock())
+        return text
+
+    def _refresh(self, key, yql, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, yql, fetch)
+            except Exception:
+                # the stale response stays until the next try
+                self._count('refresh_errors')
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        """Returns the hit and miss counts and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {'hits': self.hits,
+                    'stale_hits': self.stale_hits,
+                    'misses': self.misses,
+                    'refresh_errors': self.refresh_errors,
+                    'hit_rate': ((self.hits + self.stale_hits) / lookups
+                                 if lookups else 0.0)}
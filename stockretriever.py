@@ -5,8 +5,15 @@ from param import (
     HISTORICAL_URL,
     RSS_URL,
     FINANCE_TABLES)
+import asyncio
+import concurrent.futures
+import functools
+import threading
 import urllib
 import http.client
+import zlib
+
+import historical
 
 try:
     import simplejson as json
@@ -14,16 +21,122 @@ except ImportError:
     import json
 
 
+YQL_HOST = 'query.yahooapis.com'
+# most worker threads an AsyncStockRetriever starts
+MAX_THREADS = 32
+
+
+class HTTPConnectionPool(object):
+    """Thread-safe pool of keep-alive HTTP connections.
+
+    Connections are kept per (host, port), at most maxsize idle ones
+    each, and used by one request at a time. A kept connection that the
+    server closed in the meantime (RemoteDisconnected) is dropped and the
+    request is sent again on another one. Responses are asked for gzip
+    and decompressed while they are read."""
+
+    def __init__(self, maxsize=10):
+        self.maxsize = maxsize
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _get(self, host, port, timeout):
+        with self._lock:
+            idle = self._idle.get((host, port))
+            connection = idle.pop() if idle else None
+        reused = connection is not None
+        if not reused:
+            connection = http.client.HTTPConnection(host, port)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, reused
+
+    def _put(self, host, port, connection):
+        with self._lock:
+            idle = self._idle.setdefault((host, port), [])
+            if len(idle) < self.maxsize:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _read(self, response):
+        encoding = (response.getheader('Content-Encoding') or '').lower()
+        if encoding != 'gzip':
+            return response.read()
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        while True:
+            chunk = response.read(65536)
+            if not chunk:
+                break
+            chunks.append(decoder.decompress(chunk))
+        chunks.append(decoder.flush())
+        return b''.join(chunks)
+
+    def request(self, host, port, url, headers=None, timeout=None):
+        """GETs url from host, returns (status, body bytes)."""
+
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        while True:
+            connection, reused = self._get(host, port, timeout)
+            try:
+                connection.request('GET', url, headers=headers)
+                response = connection.getresponse()
+                body = self._read(response)
+            except (ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                if reused:
+                    # closed by the server while it was idle
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._put(host, port, connection)
+            return response.status, body
+
+    def close(self):
+        """Closes the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+# used by every YQLQuery not given a pool of its own
+shared_pool = HTTPConnectionPool()
+
+
 class YQLQuery(object):
-    def __init__(self):
-        self.connection = http.client.HTTPConnection('query.yahooapis.com')
+    def __init__(self, host=YQL_HOST, port=None, timeout=None, pool=None,
+                 cache=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.pool = pool or shared_pool
+        # a response_cache.ResponseCache, or None to always ask the server
+        self.cache = cache
 
-    def execute(self, yql):
+    def _fetch(self, yql):
         queryString = urllib.parse.urlencode({'q': yql,
                                               'format': 'json',
                                               'env': DATATABLES_URL})
-        self.connection.request('GET', PUBLIC_API_URL + '?' + queryString)
-        response_text = self.connection.getresponse().read().decode('UTF-8')
+        status, body = self.pool.request(self.host, self.port,
+                                         PUBLIC_API_URL + '?' + queryString,
+                                         timeout=self.timeout)
+        return status, body.decode('UTF-8')
+
+    def execute(self, yql):
+        if self.cache is None:
+            response_text = self._fetch(yql)[1]
+        else:
+            response_text = self.cache.fetch(yql, self._fetch)
         return json.loads(response_text)
 
 
@@ -38,8 +151,8 @@ class QueryError(Exception):
 class StockRetriever(YQLQuery):
     """A wrapper for the Yahoo! Finance YQL api."""
 
-    def __init__(self):
-        super(StockRetriever, self).__init__()
+    def __init__(self, *args, **kwargs):
+        super(StockRetriever, self).__init__(*args, **kwargs)
 
     def __format_symbol_list(self, symbolList):
         return ",".join(["\""+stock+"\"" for stock in symbolList])
@@ -84,6 +197,14 @@ class StockRetriever(YQLQuery):
         del results['query']['results']['row'][0]
         return results['query']['results']['row']
 
+    def get_historical_prices(self, symbol, start=None, end=None,
+                              interval='d', max_rows=None):
+        """Retrieves historical stock data for the provided symbol as a
+        historical.PRICE_DTYPE array, parsed while the CSV streams in
+        straight from Yahoo! Finance rather than through YQL."""
+
+        return historical.fetch_prices(symbol, start, end, interval, max_rows)
+
     def get_news_feed(self, symbol):
         """Retrieves the rss feed for the provided symbol."""
 
@@ -133,6 +254,244 @@ class StockRetriever(YQLQuery):
         return self.__validate_response(response, 'industry')
 
 
+def _quotes_by_symbol(quotes):
+    # YQL answers a single symbol with the quote itself, more with a list
+    if isinstance(quotes, dict):
+        quotes = [quotes]
+    return dict((str(quote.get('symbol', '')).upper(), quote)
+                for quote in quotes)
+
+
+class QuoteBatcher(object):
+    """Merges the get_current_info calls of many callers into few queries.
+
+    Single symbols asked for within wait seconds of each other go out as
+    one 'symbol in (...)' query of at most max_batch_size symbols, and
+    each caller gets the quote of its own symbol back. Safe to share
+    between threads, batches run on executor if one is given.
+
+    >>> quotes = QuoteBatcher(StockRetriever())
+    >>> quotes.get_current_info('YHOO')['LastTradePriceOnly']
+    """
+
+    def __init__(self, retriever=None, max_batch_size=50, wait=0.005,
+                 executor=None):
+        self.retriever = retriever or StockRetriever()
+        self.max_batch_size = max_batch_size
+        self.wait = wait
+        self.executor = executor
+        self.queries = 0
+        # columns -> [(symbol, future)] waiting for the next query
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_current_info(self, symbol, columnsToRetrieve='*'):
+        """Quote of one symbol (15 minute delay)."""
+        return self.submit(symbol, columnsToRetrieve).result()
+
+    def get_many(self, symbolList, columnsToRetrieve='*'):
+        """Quotes of symbolList, in max_batch_size queries."""
+        futures = [self.submit(symbol, columnsToRetrieve)
+                   for symbol in symbolList]
+        return [future.result() for future in futures]
+
+    def submit(self, symbol, columnsToRetrieve='*'):
+        """Returns a concurrent.futures.Future of the quote of symbol."""
+        if columnsToRetrieve == '*':
+            columns = '*'
+        else:
+            # the answer is handed out by symbol
+            columns = tuple(columnsToRetrieve)
+            if 'symbol' not in columns:
+                columns += ('symbol',)
+        future = concurrent.futures.Future()
+        with self._lock:
+            batch = self._pending.setdefault(columns, [])
+            batch.append((symbol, future))
+            if len(batch) >= self.max_batch_size:
+                del self._pending[columns]
+                self._start(self._run, columns, batch)
+            elif len(batch) == 1:
+                timer = threading.Timer(self.wait, self._flush,
+                                        (columns, batch))
+                timer.daemon = True
+                timer.start()
+        return future
+
+    def _start(self, function, *args):
+        if self.executor is not None:
+            self.executor.submit(function, *args)
+        else:
+            threading.Thread(target=function, args=args, daemon=True).start()
+
+    def _flush(self, columns, batch):
+        with self._lock:
+            if self._pending.get(columns) is not batch:
+                # already sent when it got full
+                return
+            del self._pending[columns]
+        self._start(self._run, columns, batch)
+
+    def _run(self, columns, batch):
+        symbols = []
+        seen = set()
+        for symbol, _ in batch:
+            if symbol.upper() not in seen:
+                seen.add(symbol.upper())
+                symbols.append(symbol)
+        try:
+            quotes = _quotes_by_symbol(
+                self.retriever.get_current_info(symbols, columns))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self.queries += 1
+        for symbol, future in batch:
+            quote = quotes.get(symbol.upper())
+            if quote is None:
+                future.set_exception(
+                    QueryError('No quote for "%s".' % symbol))
+            else:
+                future.set_result(dict(quote))
+
+
+class AsyncStockRetriever(object):
+    """asyncio version of StockRetriever.
+
+    Every method of StockRetriever is a coroutine here. The requests run
+    on a pool of max_concurrency worker threads sharing a pool of
+    keep-alive connections, at most max_concurrency of them are in
+    flight, all to the one YQL host, and each one gives up after timeout
+    seconds.
+
+    This is blocking http.client wrapped in coroutines, not an asyncio
+    HTTP client: every request in flight holds a thread, so
+    max_concurrency is capped at MAX_THREADS and the requests of a long
+    symbol list wait in turn. A request that times out returns
+    asyncio.TimeoutError at once, but keeps its thread, and its place
+    among the max_concurrency, until the socket timeout (also timeout)
+    ends the blocked read.
+
+    >>> async def main():
+    ...     async with AsyncStockRetriever(max_concurrency=20) as stocks:
+    ...         news = await stocks.gather('get_news_feed',
+    ...                                    ['yhoo', 'aapl', 'goog'])
+    >>> asyncio.run(main())
+    """
+
+    def __init__(self, max_concurrency=10, timeout=30, host=YQL_HOST,
+                 port=None, cache=None):
+        max_concurrency = min(max_concurrency, MAX_THREADS)
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='AsyncStockRetriever')
+        self._pool = HTTPConnectionPool(maxsize=max_concurrency)
+        self._retriever = StockRetriever(host, port, timeout, self._pool,
+                                         cache)
+        self._batcher = QuoteBatcher(self._retriever, executor=self._executor)
+        self._max_concurrency = max_concurrency
+        # the semaphore is made in the loop that uses it
+        self._limit = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_ty, exc_val, tb):
+        # the running requests are waited for in a thread, so the loop
+        # keeps running other tasks meanwhile
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def close(self):
+        """Wait for the running requests and close all connections.
+
+        Blocks, coroutines leave the async with block instead."""
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
+    def _run(self, name, args, kwargs):
+        return getattr(self._retriever, name)(*args, **kwargs)
+
+    async def _call(self, name, *args, **kwargs):
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self._max_concurrency)
+        loop = asyncio.get_running_loop()
+        await self._limit.acquire()
+        try:
+            future = loop.run_in_executor(
+                self._executor,
+                functools.partial(self._run, name, args, kwargs))
+        except BaseException:
+            self._limit.release()
+            raise
+        # released when the thread is free again, not at the timeout, so
+        # the next request does not wait for a thread on its own timeout
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.shield(future), self._timeout)
+
+    def _release(self, future):
+        self._limit.release()
+        if not future.cancelled():
+            # retrieved, also when nobody waits for it after a timeout
+            future.exception()
+
+    async def gather(self, method, symbols, *args, **kwargs):
+        """Calls method for every symbol at the same time.
+
+        Returns a dict of symbol -> result, or the exception raised for
+        that symbol (QueryError, asyncio.TimeoutError, ...), so one bad
+        symbol does not lose the others."""
+
+        results = await asyncio.gather(
+            *[getattr(self, method)(symbol, *args, **kwargs)
+              for symbol in symbols],
+            return_exceptions=True)
+        return dict(zip(symbols, results))
+
+    async def get_current_info(self, symbolList, columnsToRetrieve='*'):
+        """Coroutine version of StockRetriever.get_current_info."""
+        return await self._call('get_current_info', symbolList,
+                                columnsToRetrieve)
+
+    async def get_quote(self, symbol, columnsToRetrieve='*'):
+        """Quote of one symbol, batched with the get_quote calls of the
+        other tasks into few get_current_info queries (QuoteBatcher)."""
+        return await asyncio.wrap_future(
+            self._batcher.submit(symbol, columnsToRetrieve))
+
+    async def get_historical_info(self, symbol):
+        """Coroutine version of StockRetriever.get_historical_info."""
+        return await self._call('get_historical_info', symbol)
+
+    async def get_news_feed(self, symbol):
+        """Coroutine version of StockRetriever.get_news_feed."""
+        return await self._call('get_news_feed', symbol)
+
+    async def get_options_info(self, symbol, expiration='',
+                               columnsToRetrieve='*'):
+        """Coroutine version of StockRetriever.get_options_info."""
+        return await self._call('get_options_info', symbol, expiration,
+                                columnsToRetrieve)
+
+    async def get_index_summary(self, index, columnsToRetrieve='*'):
+        """Coroutine version of StockRetriever.get_index_summary."""
+        return await self._call('get_index_summary', index,
+                                columnsToRetrieve)
+
+    async def get_industry_ids(self):
+        """Coroutine version of StockRetriever.get_industry_ids."""
+        return await self._call('get_industry_ids')
+
+    async def get_industry_index(self, id):
+        """Coroutine version of StockRetriever.get_industry_index."""
+        return await self._call('get_industry_index', id)
+
+
 if __name__ == "__main__":
     retriever = StockRetriever()
     try:
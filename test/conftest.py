@@ -0,0 +1,44 @@
+"""
+shared fixtures of the DBWrapper tests
+
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import pytest
+
+from modules.db_wrapper import DBWrapper
+
+TABLE_NAME = "yahoo_news"
+ATTR_LIST = ["title", "description", "link", "pubDate", "allNews"]
+PUB_DATE = 1526196605
+
+
+def make_rows(start, num, step=1, base=PUB_DATE, body="金融 news {}",
+              repeat=1):
+    # rows start to start + num of ATTR_LIST, published step seconds apart
+    return [["title {}".format(i), "desc {}".format(i), "link",
+             base + i * step, body.format(i) * repeat]
+            for i in range(start, start + num)]
+
+
+@pytest.fixture
+def news_rows():
+    """make_rows(start, num, step=1, base=PUB_DATE, body=..., repeat=1)"""
+    return make_rows
+
+
+@pytest.fixture
+def news_db(tmp_path):
+    """
+    |  factory of TABLE_NAME dbs in a temp directory,
+       news_db(values_list=(), key="md5", attr_types=None,
+       name="news.db") creates the table, inserts values_list and
+       returns the path of the db
+    """
+    def make(values_list=(), key="md5", attr_types=None, name="news.db"):
+        path = str(tmp_path / name)
+        with DBWrapper(path, key=key) as db:
+            db.create_table(TABLE_NAME, ATTR_LIST, attr_types=attr_types)
+            if values_list:
+                db.data_insert(TABLE_NAME, ATTR_LIST, values_list)
+        return path
+    return make
@@ -0,0 +1,156 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stockretriever import MAX_THREADS, AsyncStockRetriever, QueryError
+
+
+class StubYQLHandler(BaseHTTPRequestHandler):
+    """answers rss queries like YQL, after the delay of the server"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            query = urllib.parse.parse_qs(
+                urllib.parse.urlsplit(self.path).query)
+            yql = query["q"][0]
+            symbol = yql.split("s=")[-1].rstrip("'")
+            time.sleep(2 if symbol == "slow" else server.delay)
+            if symbol == "none":
+                title = "Yahoo! Finance: RSS feed not found"
+            else:
+                title = "news of {}".format(symbol)
+            body = json.dumps({"query": {"results": {"item": [
+                {"title": title, "link": "link", "description": "desc",
+                 "pubDate": "Sun, 13 May 2018 07:30:05 GMT"}]}}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(delay):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubYQLHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_gather_in_parallel():
+    server = start_server(0.2)
+    symbols = ["s{}".format(i) for i in range(10)]
+
+    async def fetch():
+        async with AsyncStockRetriever(max_concurrency=10, timeout=5,
+                                       host="127.0.0.1",
+                                       port=server.server_port) as stocks:
+            return await stocks.gather("get_news_feed", symbols + ["none"])
+
+    begin = time.time()
+    results = asyncio.run(fetch())
+    # 11 requests of 0.2s, sequential would be 2.2s
+    assert time.time() - begin < 1.0
+    assert results["s3"][0]["title"] == "news of s3"
+    assert isinstance(results["none"], QueryError)
+    server.shutdown()
+
+
+def test_limit_and_timeout():
+    server = start_server(0.05)
+    symbols = ["s{}".format(i) for i in range(12)]
+
+    async def fetch():
+        async with AsyncStockRetriever(max_concurrency=3, timeout=0.5,
+                                       host="127.0.0.1",
+                                       port=server.server_port) as stocks:
+            results = await stocks.gather("get_news_feed", symbols + ["slow"])
+            # the connection of the timed out request is replaced
+            results["after"] = await stocks.get_news_feed("after")
+            return results
+
+    results = asyncio.run(fetch())
+    assert server.max_active <= 3
+    assert isinstance(results["slow"], asyncio.TimeoutError)
+    assert all(results[s][0]["title"] == "news of " + s for s in symbols)
+    assert results["after"][0]["title"] == "news of after"
+    server.shutdown()
+
+
+def test_max_threads():
+    server = start_server(0.1)
+    symbols = ["s{}".format(i) for i in range(MAX_THREADS * 2)]
+
+    async def fetch():
+        async with AsyncStockRetriever(max_concurrency=1000, timeout=5,
+                                       host="127.0.0.1",
+                                       port=server.server_port) as stocks:
+            results = await stocks.gather("get_news_feed", symbols)
+            threads = [t for t in threading.enumerate()
+                       if t.name.startswith("AsyncStockRetriever")]
+            return results, len(threads)
+
+    results, threads = asyncio.run(fetch())
+    assert threads <= MAX_THREADS
+    assert server.max_active <= MAX_THREADS
+    assert all(results[s][0]["title"] == "news of " + s for s in symbols)
+    server.shutdown()
+
+
+def test_close_off_the_loop():
+    server = start_server(0.6)
+
+    async def fetch():
+        ticks = list()
+
+        async def tick():
+            while True:
+                ticks.append(time.time())
+                await asyncio.sleep(0.05)
+
+        ticker = asyncio.ensure_future(tick())
+        async with AsyncStockRetriever(timeout=5, host="127.0.0.1",
+                                       port=server.server_port) as stocks:
+            request = asyncio.ensure_future(stocks.get_news_feed("s1"))
+            await asyncio.sleep(0.1)
+            closing = len(ticks)
+        ticker.cancel()
+        return len(ticks) - closing, await request
+
+    # the loop keeps ticking while the exit waits for the request
+    ticks, result = asyncio.run(fetch())
+    assert ticks >= 5
+    assert result[0]["title"] == "news of s1"
+    server.shutdown()
+
+
+def main():
+    test_gather_in_parallel()
+    test_limit_and_timeout()
+    test_max_threads()
+    test_close_off_the_loop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import tempfile
+
+from modules.db_wrapper import DBWrapper
+
+
+def test_bulk_insert():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        table_name = "yahoo_news"
+        attr_list = ["title", "description", "pubDate"]
+        values_list = [["title {}".format(i % 900), "desc", i]
+                       for i in range(1000)]
+        snapshot = [list(v) for v in values_list]
+
+        with DBWrapper(path) as db:
+            db.create_table(table_name, attr_list)
+            result = db.bulk_insert(table_name, attr_list,
+                                    (v for v in values_list),
+                                    commit_every=128)
+            assert result["rows"] == 1000
+            # titles repeat after 900 rows, their ids are ignored
+            assert result["inserted"] == 900
+            assert result["rows_per_sec"] > 0
+            assert values_list == snapshot
+
+            db.data_insert(table_name, attr_list, values_list)
+            assert values_list == snapshot
+
+            data_list = db.get_data_from_attr(table_name, ["id", "title"])
+            assert len(data_list) == 900
+            assert data_list[0] == [db._get_hash("title 0"), "title 0"]
+
+        with DBWrapper(path) as db:
+            db._cursor.execute("PRAGMA journal_mode")
+            assert db._cursor.fetchone()[0] == "wal"
+
+
+def test_bulk_insert_failed_chunk():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        table_name = "yahoo_news"
+        attr_list = ["title", "pubDate"]
+        with DBWrapper(path, seen_ids=True) as db:
+            db.create_table(table_name, attr_list)
+            result = db.bulk_insert(table_name, attr_list,
+                                    [["a", 1], ["b", 2], ["c"], ["d", 4]])
+            assert result["rows"] == 0 and result["inserted"] == 0
+            # the fixed row is not taken for a duplicate
+            db.data_insert(table_name, attr_list, [["c", 3]])
+
+        with DBWrapper(path) as db:
+            assert db.get_data_from_attr(table_name, ["title"]) == [["c"]]
+
+
+def main():
+    test_bulk_insert()
+    test_bulk_insert_failed_chunk()
+
+
+if __name__ == '__main__':
+    main()
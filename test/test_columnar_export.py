@@ -0,0 +1,135 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+
+import pytest
+
+from modules.db_wrapper import DBWrapper
+
+pytest.importorskip("pyarrow")
+from modules import columnar_export  # noqa: E402
+from modules.columnar_export import (  # noqa: E402
+    count_query_by_time,
+    open_dataset,
+    read_by_time,
+    sync_table,
+)
+
+
+@pytest.fixture
+def make_rows(news_rows):
+    # one row every 20 minutes, 72 a day
+    def make(start, num):
+        return news_rows(start, num, step=1200, base=1526169600,
+                         body="金融 news 觀察 {}")
+    return make
+
+
+def check_export(path, key, fmt, make_rows):
+    out_dir = os.path.join(os.path.dirname(path), "export")
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    with DBWrapper(path, key=key) as db:
+        result = sync_table(db, table_name, out_dir, fmt=fmt,
+                            batch_size=50)
+        assert result["rows"] == 200
+        assert result["files"] == 3
+
+        # only the new rows are appended
+        db.data_insert(table_name, attr_list, make_rows(150, 100))
+        result = sync_table(db, table_name, out_dir, fmt=fmt)
+        assert result["rows"] == 50
+        assert sync_table(db, table_name, out_dir, fmt=fmt)["rows"] == 0
+
+        assert open_dataset(out_dir).count_rows() == 250
+        start = 1526169600 + 3600
+        end = start + 86400 * 2
+        table = read_by_time(out_dir, start, end,
+                             columns=["title", "pubDate"])
+        data_list = db.get_data_by_time(table_name, start, end)
+        assert sorted(table.column("title").to_pylist()) == \
+            sorted(d[1] for d in data_list)
+
+        for query_col in ["all", "title", "allnews"]:
+            assert count_query_by_time(
+                    out_dir, ["金融", "觀察"], start, end,
+                    query_col=query_col) == db.get_count_query_by_time(
+                    table_name, ["金融", "觀察"], start, end,
+                    query_col=query_col)
+
+
+def test_export_parquet(news_db, make_rows):
+    check_export(news_db(make_rows(0, 200)), "md5", "parquet", make_rows)
+
+
+def test_export_arrow_blake2b(news_db, make_rows):
+    check_export(news_db(make_rows(0, 200), key="blake2b"), "blake2b",
+                 "arrow", make_rows)
+
+
+def test_stopped_sync(news_db, make_rows):
+    path = news_db(make_rows(0, 100), key="blake2b")
+    out_dir = os.path.join(os.path.dirname(path), "export")
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    with DBWrapper(path, key="blake2b") as db:
+        sync_table(db, table_name, out_dir, batch_size=30)
+        db.data_insert(table_name, attr_list, make_rows(100, 200))
+
+        # stopped after the first day of new rows was written
+        write = columnar_export._DayWriter.write
+        writes = list()
+
+        def failing_write(self, rows):
+            if len(writes) == 2:
+                raise KeyboardInterrupt
+            writes.append(rows)
+            write(self, rows)
+
+        columnar_export._DayWriter.write = failing_write
+        try:
+            sync_table(db, table_name, out_dir, batch_size=30)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            columnar_export._DayWriter.write = write
+        # the staged parts of the stopped sync are not in the dataset
+        assert open_dataset(out_dir).count_rows() == 100
+
+        assert sync_table(db, table_name, out_dir)["rows"] == 200
+        assert open_dataset(out_dir).count_rows() == 300
+        assert not os.path.exists(os.path.join(out_dir, "_staging"))
+        ids = open_dataset(out_dir).to_table(
+                columns=["id"]).column("id").to_pylist()
+        assert len(set(ids)) == 300
+
+
+@pytest.mark.parametrize("key", ["md5", "blake2b"])
+def test_late_rows(news_db, make_rows, key):
+    path = news_db(make_rows(100, 5), key=key)
+    out_dir = os.path.join(os.path.dirname(path), "export")
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    with DBWrapper(path, key=key) as db:
+        assert sync_table(db, table_name, out_dir)["rows"] == 5
+
+        # inserted after the export, published before its rows
+        db.data_insert(table_name, attr_list, make_rows(0, 1) +
+                       make_rows(100, 5))
+        assert sync_table(db, table_name, out_dir)["rows"] == 1
+        assert sync_table(db, table_name, out_dir)["rows"] == 0
+        titles = open_dataset(out_dir).to_table(
+                columns=["title"]).column("title").to_pylist()
+        assert sorted(titles) == sorted(
+                row[0] for row in make_rows(0, 1) + make_rows(100, 5))
+
+
+def main():
+    # the tests take their db from the fixtures in conftest.py
+    pytest.main([__file__])
+
+
+if __name__ == '__main__':
+    main()
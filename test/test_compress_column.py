@@ -0,0 +1,104 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import itertools
+import sqlite3
+
+import pytest
+
+from modules.db_wrapper import DBWrapper
+
+
+@pytest.fixture
+def make_rows(news_rows):
+    def make(start, num):
+        return news_rows(start, num, body="金融 觀察 news body {} ",
+                         repeat=20)
+    return make
+
+
+def test_compress_column(news_db, make_rows):
+    path = news_db(make_rows(0, 300))
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    start = 1526196605
+    end = start + 400
+    with DBWrapper(path) as db:
+        db.create_fts_index(table_name)
+        data_list = db.get_data_by_time(table_name, start, end)
+        count = db.get_count_query_by_time(table_name, ["金融"],
+                                           start, end)
+
+        result = db.compress_column(table_name, "allNews",
+                                    batch_rows=64, vacuum=True)
+        assert result["rows"] == 300
+        assert result["compressed_bytes"] < result["bytes"]
+
+        assert db.get_data_by_time(table_name, start, end) == data_list
+        assert db.get_count_query_by_time(table_name, ["金融"],
+                                          start, end) == count
+        rows = list(db.iter_data_by_time(table_name, start, end,
+                                         attr_list=["title", "allnews"]))
+        assert rows == [[d[1], d[5]] for d in data_list]
+
+        # new rows are stored compressed and indexed too
+        db.data_insert(table_name, attr_list, make_rows(300, 100))
+        assert db.get_count_query_by_time(table_name, ["金融"], start,
+                                          end, use_fts=True) == 400 * 20
+        data_list = db.get_data_from_attr(table_name,
+                                          ["title", "allNews"])
+        assert ["title 399", make_rows(399, 1)[0][4]] in data_list
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT count(*) FROM yahoo_news WHERE allNews "
+                        "IS NOT NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT count(*) FROM yahoo_news_allNews_z"
+                        ).fetchone()[0] == 400
+    conn.close()
+
+
+def test_compress_column_stopped(news_db, make_rows):
+    path = news_db(make_rows(0, 10))
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    start = 1526196605
+    end = start + 100
+    with DBWrapper(path) as db, DBWrapper(path) as other:
+        data_list = db.get_data_by_time(table_name, start, end)
+        count = db.get_count_query_by_time(table_name, ["金融"],
+                                           start, end)
+        # knows of no compressed column from now on
+        assert not other._compressed_cols(table_name)
+
+        # stopped after the first batch of 3 rows
+        batches = db._rowid_batches
+        db._rowid_batches = lambda *args: itertools.islice(
+                batches(*args), 1)
+        assert db.compress_column(table_name, batch_rows=3)["rows"] == 3
+        db._rowid_batches = batches
+
+        assert db.get_data_by_time(table_name, start, end) == data_list
+        assert db.get_count_query_by_time(table_name, ["金融"],
+                                          start, end) == count
+        assert [row[1:] for row in db.iter_data_after(
+                table_name, attr_list=["allNews"])] == \
+            [[row[4]] for row in make_rows(0, 10)]
+
+        # rows written uncompressed by other are read back too
+        other.data_insert(table_name, attr_list, make_rows(10, 2))
+        other._commit()
+        data_list = db.get_data_by_time(table_name, start, end)
+        assert data_list[-1][-1] == make_rows(11, 1)[0][4]
+
+        assert db.compress_column(table_name, batch_rows=3)["rows"] == 9
+        assert db.get_data_by_time(table_name, start, end) == data_list
+
+
+def main():
+    # the tests take their db from the fixtures in conftest.py
+    pytest.main([__file__])
+
+
+if __name__ == '__main__':
+    main()
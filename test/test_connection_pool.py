@@ -0,0 +1,118 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stockretriever import HTTPConnectionPool, StockRetriever
+
+
+class StubYQLHandler(BaseHTTPRequestHandler):
+    """answers every query with the same rss item, gzipped if asked to"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"query": {"results": {"item": [
+            {"title": "news " * 100, "link": "link", "description": "desc",
+             "pubDate": "Sun, 13 May 2018 07:30:05 GMT"}]}}}).encode()
+        # counted before answering, the client may return right after
+        with self.server.lock:
+            self.server.requests += 1
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # hang up without telling the client, like an idle timeout
+        self.close_connection = self.server.drop_connections
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super(StubServer, self).__init__(("127.0.0.1", 0), StubYQLHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.drop_connections = False
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super(StubServer, self).process_request(request, client_address)
+
+
+def start_server():
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_keep_alive_and_gzip():
+    server = start_server()
+    pool = HTTPConnectionPool()
+    for _ in range(10):
+        # a new retriever per request still reuses the connection
+        stocks = StockRetriever("127.0.0.1", server.server_port, pool=pool)
+        news = stocks.get_news_feed("yhoo")
+        assert news[0]["title"] == "news " * 100
+    assert server.requests == 10
+    assert server.connections == 1
+    pool.close()
+    server.shutdown()
+
+
+def test_reconnect_after_server_hang_up():
+    server = start_server()
+    server.drop_connections = True
+    pool = HTTPConnectionPool()
+    stocks = StockRetriever("127.0.0.1", server.server_port, pool=pool)
+    for _ in range(5):
+        assert stocks.get_news_feed("yhoo")[0]["link"] == "link"
+    assert server.requests == 5
+    pool.close()
+    server.shutdown()
+
+
+def test_shared_between_threads():
+    server = start_server()
+    pool = HTTPConnectionPool(maxsize=4)
+    stocks = StockRetriever("127.0.0.1", server.server_port, pool=pool)
+    errors = list()
+
+    def fetch():
+        try:
+            for _ in range(20):
+                stocks.get_news_feed("yhoo")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+    assert server.requests == 160
+    assert server.connections < 160
+    pool.close()
+    server.shutdown()
+
+
+def main():
+    test_keep_alive_and_gzip()
+    test_reconnect_after_server_hang_up()
+    test_shared_between_threads()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import random
+
+import pytest
+
+from modules.db_wrapper import DBWrapper
+
+WORDS = ["金融", "觀察", "股市", "台積電", "美元", "Apple", "金", "融"]
+
+
+def make_values(num=300):
+    rnd = random.Random(13)
+    values_list = list()
+    for i in range(num):
+        text = ["".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, n)))
+                for n in (8, 20, 200)]
+        values_list.append(["{} {}".format(i, text[0]), text[1],
+                            "link {}".format(i), 1526196605 + i * 7,
+                            text[2]])
+    return values_list
+
+
+def python_count(values_list, query_list, start, end, cols):
+    count = 0
+    for values in values_list:
+        if start <= values[3] < end:
+            for i in cols:
+                for q in query_list:
+                    count += str(values[i]).count(q)
+    return count
+
+
+def test_get_count_query_by_time(news_db):
+    values_list = make_values()
+    path = news_db(values_list, attr_types={"pubDate": "INTEGER"})
+    query_list = ["金融", "觀察", "金"]
+    start = 1526196605 + 100
+    end = 1526196605 + 1500
+    with DBWrapper(path) as db:
+        for query_col, cols in [("title", [0]), ("desc", [1]),
+                                ("allnews", [4]), ("all", [0, 1, 4]),
+                                ("title,allnews", [0, 4])]:
+            count = db.get_count_query_by_time(
+                        "yahoo_news", query_list, start, end,
+                        query_col=query_col)
+            assert count == python_count(values_list, query_list,
+                                         start, end, cols)
+        assert db.get_count_query_by_time(
+                   "yahoo_news", query_list, 0, 1) == 0
+
+
+def test_get_count_query_by_time_buckets(news_db):
+    values_list = make_values()
+    path = news_db(values_list, attr_types={"pubDate": "INTEGER"})
+    query_list = ["股市", "美元"]
+    start = 1526196605 - 50
+    end = 1526196605 + 2000
+    bucket_size = 300
+    with DBWrapper(path) as db:
+        counts = db.get_count_query_by_time_buckets(
+                    "yahoo_news", query_list, start, end, bucket_size,
+                    query_col="all")
+        expected = [python_count(values_list, query_list, s,
+                                 min(s + bucket_size, end), [0, 1, 4])
+                    for s in range(start, end, bucket_size)]
+        assert counts == expected
+
+        for bad_size in (0, -300):
+            try:
+                db.get_count_query_by_time_buckets(
+                    "yahoo_news", query_list, start, end, bad_size)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("bucket_size {} was taken".format(
+                                     bad_size))
+
+
+def main():
+    # the tests take their db from the fixtures in conftest.py
+    pytest.main([__file__])
+
+
+if __name__ == '__main__':
+    main()
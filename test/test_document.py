@@ -0,0 +1,65 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import shutil
+import tempfile
+
+import compiled_model
+import document
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_tweets(vocabulary, num=40):
+    # tokens of real vocabulary terms (bytes, as read from model.file),
+    # plus one that is not in it
+    terms = sorted(vocabulary)
+    step = len(terms) // (num * 3)
+    return [[terms[(i * 3 + j) * step] for j in range(1 + i % 3)]
+            + [b"not-a-term"] for i in range(num)]
+
+
+def test_load_document():
+    with tempfile.TemporaryDirectory() as tmp:
+        model_file = os.path.join(tmp, "model.file")
+        compiled = os.path.join(tmp, "model.bin")
+        shutil.copy(os.path.join(ROOT, "model.file"), model_file)
+
+        # no compiled model, the scores are precomputed from model.file
+        plain = document.load_document(model_file, compiled)
+        tweets = make_tweets(plain.vocabulary)
+        labels = list()
+        for tokens in tweets:
+            present = set(plain.termIndex[t] for t in tokens
+                          if t in plain.termIndex)
+            assert present
+            labels.append(plain.testModel(tokens))
+            assert labels[-1] == plain.fullScan(present)
+        assert set(labels) == {"0", "1"}
+
+        compiled_model.compile_model(model_file,
+                                     os.path.join(ROOT, "model.json"),
+                                     compiled)
+        loaded = document.load_document(model_file, compiled)
+        assert not loaded.condProb
+        assert [loaded.testModel(tokens) for tokens in tweets] == labels
+
+        # a model.file retrained after model.bin was built wins
+        os.utime(compiled, (0, 0))
+        stale = document.load_document(model_file, compiled)
+        assert stale.condProb
+
+
+def test_get_document():
+    assert document.get_document() is document.get_document()
+
+
+def main():
+    test_load_document()
+    test_get_document()
+
+
+if __name__ == '__main__':
+    main()
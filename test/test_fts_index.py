@@ -0,0 +1,66 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import random
+import tempfile
+
+from modules.db_wrapper import DBWrapper
+
+WORDS = ["金融", "觀察", "股市", "台積電", "美元", "Apple ", "金", "融",
+         " shares ", "。", "黃金價格"]
+
+
+def make_values_list(rnd, num, offset):
+    values_list = list()
+    for i in range(num):
+        text = ["".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, n)))
+                for n in (6, 20, 100)]
+        values_list.append(["{} {}".format(offset + i, text[0]), text[1],
+                            "link", 1526196605 + (offset + i) * 7, text[2]])
+    return values_list
+
+
+def test_count_with_fts_index():
+    rnd = random.Random(14)
+    with tempfile.TemporaryDirectory() as tmp:
+        with DBWrapper(os.path.join(tmp, "news.db")) as db:
+            table_name = "yahoo_news"
+            attr_list = ["title", "description", "link", "pubDate", "allNews"]
+            db.create_table(table_name, attr_list,
+                            attr_types={"pubDate": "INTEGER"})
+            # rows from before and after the index is created
+            db.data_insert(table_name, attr_list,
+                           make_values_list(rnd, 200, 0))
+            db.create_fts_index(table_name)
+            db.data_insert(table_name, attr_list,
+                           make_values_list(rnd, 200, 200))
+
+            start = 1526196605 + 300
+            end = 1526196605 + 2500
+            for query_list in (["金融", "觀察"], ["台積電"], ["金"],
+                               ["價格", "Apple"], ["shares"], ["融股"]):
+                for query_col in ("all", "title", "desc", "allnews"):
+                    count = db.get_count_query_by_time(
+                                table_name, query_list, start, end,
+                                query_col=query_col)
+                    fts_count = db.get_count_query_by_time(
+                                    table_name, query_list, start, end,
+                                    query_col=query_col, use_fts=True)
+                    assert fts_count == count, (query_list, query_col)
+
+                counts = db.get_count_query_by_time_buckets(
+                            table_name, query_list, start, end, 600)
+                fts_counts = db.get_count_query_by_time_buckets(
+                                table_name, query_list, start, end, 600,
+                                use_fts=True)
+                assert fts_counts == counts
+
+
+def main():
+    test_count_with_fts_index()
+
+
+if __name__ == '__main__':
+    main()
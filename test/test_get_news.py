@@ -15,7 +15,8 @@ def main():
     with DBWrapper("news.db") as db:
         table_name = "yahoo_news"
         attr_list = ["title", "description", "link", "pubDate", "allNews"]
-        db.create_table(table_name, attr_list)
+        db.create_table(table_name, attr_list,
+                        attr_types={"pubDate": "INTEGER"})
         try:
             '''
             gets news articles related to symbol, returns a dictionary,
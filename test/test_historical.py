@@ -0,0 +1,147 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import datetime
+import io
+
+import numpy as np
+
+import historical
+
+HEADER = b"Date,Open,High,Low,Close,Volume,Adj Close\n"
+
+
+def make_csv(days, newline=b"\n"):
+    lines = [HEADER.rstrip(b"\n")]
+    day = datetime.date(2018, 5, 11)
+    for i in range(days):
+        price = 40 + i % 17 * 0.25
+        lines.append("{},{:.2f},{:.2f},{:.2f},{:.2f},{},{:.6f}".format(
+                     day - datetime.timedelta(days=i), price, price + 1,
+                     price - 1, price + 0.5, 1000000 + i,
+                     price / 3).encode("ascii"))
+    return newline.join(lines) + newline
+
+
+def naive_parse(body):
+    rows = [line.split(b",") for line in body.splitlines()[1:] if line]
+    return [(np.datetime64(r[0].decode("ascii"), "D"),)
+            + tuple(float(c) for c in r[1:]) for r in rows]
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO counting the bytes read"""
+    def __init__(self, body):
+        super(CountingStream, self).__init__(body)
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        chunk = super(CountingStream, self).read(size)
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+def test_read_csv():
+    for newline in (b"\n", b"\r\n"):
+        body = make_csv(1000, newline)
+        expected = np.array(naive_parse(body), dtype=historical.PRICE_DTYPE)
+        # chunks ending in the middle of lines and of the header
+        for chunk_size in (7, 100, 1 << 16):
+            prices = historical.read_csv(io.BytesIO(body),
+                                         chunk_size=chunk_size)
+            assert prices.dtype == historical.PRICE_DTYPE
+            assert np.array_equal(prices, expected)
+    assert str(prices["date"][0]) == "2018-05-11"
+    assert prices["volume"][999] == 1000999
+
+    # no newline at the end of the body
+    prices = historical.read_csv(io.BytesIO(make_csv(10)[:-1]), chunk_size=16)
+    assert len(prices) == 10
+
+    assert len(historical.read_csv(io.BytesIO(HEADER))) == 0
+    assert len(historical.read_csv(io.BytesIO(b""))) == 0
+
+
+def test_read_csv_max_rows():
+    body = make_csv(10000)
+    stream = CountingStream(body)
+    prices = historical.read_csv(stream, max_rows=50, chunk_size=1024)
+    assert len(prices) == 50
+    assert np.array_equal(prices, historical.read_csv(io.BytesIO(body))[:50])
+    # stops reading one chunk after the rows it needs
+    needed = len(b"\n".join(body.split(b"\n")[:51]))
+    assert stream.read_bytes < needed + 1024
+
+
+def test_read_csv_missing_values():
+    body = (HEADER + b"2018-05-11,46.66,46.97,null,46.87,5238700,46.87\n"
+            b"\n"
+            b"2018-05-10,46.00,,46.10,46.50,4100000,46.50\n")
+    prices = historical.read_csv(io.BytesIO(body))
+    assert len(prices) == 2
+    assert np.isnan(prices["low"][0]) and np.isnan(prices["high"][1])
+    assert prices["close"][1] == 46.5
+
+    # empty or blank cells first, last and in between
+    body = (HEADER + b"2018-05-11,,2,3,4,5,6\n"
+            b"2018-05-10,1, ,3,4,5,6\r\n"
+            b"2018-05-09,1,2,3,4,5, \r\n")
+    prices = historical.read_csv(io.BytesIO(body))
+    assert np.isnan(prices["open"][0]) and prices["high"][0] == 2
+    assert np.isnan(prices["high"][1]) and np.isnan(prices["adj_close"][2])
+    assert sum(np.isnan(prices[name]).sum()
+               for name in historical.FIELDS) == 3
+
+    # a short row must not take the numbers of the next one
+    for body in (HEADER + b"2018-05-11,1,2,3,4,5\n2018-05-10,1,2,3,4,5,6,7\n",
+                 b"<html>not found</html>\n"):
+        try:
+            historical.read_csv(io.BytesIO(body))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("read %r as prices" % body)
+
+
+def test_from_rows():
+    rows = [{"Date": "2018-05-11", "Open": "46.66", "High": "46.97",
+             "Low": "46.45", "Close": "46.87", "Volume": "5238700",
+             "AdjClose": "46.87"},
+            {"Date": "2018-05-10", "Open": "46.00", "High": "null",
+             "Low": "46.10", "Close": "46.50", "Volume": "4100000",
+             "AdjClose": "46.50"}]
+    prices = historical.from_rows(rows)
+    assert prices["date"][1] == np.datetime64("2018-05-10")
+    assert prices["volume"][0] == 5238700
+    assert np.isnan(prices["high"][1])
+
+
+def test_concatenate():
+    a = historical.read_csv(io.BytesIO(make_csv(3)))
+    b = historical.read_csv(io.BytesIO(make_csv(5)))
+    symbols, indptr, prices = historical.concatenate([("A", a), ("B", b)])
+    assert symbols == ["A", "B"]
+    assert list(indptr) == [0, 3, 8]
+    assert np.array_equal(prices[indptr[1]:indptr[2]], b)
+
+
+def test_historical_url():
+    url = historical.historical_url("YHOO", datetime.date(1996, 4, 12),
+                                    datetime.date(2018, 5, 11), "w")
+    assert url.startswith("http://ichart.finance.yahoo.com/table.csv?s=YHOO")
+    assert "&d=4&e=11&f=2018" in url and "&a=3&b=12&c=1996" in url
+    assert "&g=w" in url
+
+
+def main():
+    test_read_csv()
+    test_read_csv_max_rows()
+    test_read_csv_missing_values()
+    test_from_rows()
+    test_concatenate()
+    test_historical_url()
+
+
+if __name__ == '__main__':
+    main()
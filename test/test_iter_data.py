@@ -0,0 +1,47 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import pytest
+
+from modules.db_wrapper import DBWrapper
+
+
+def test_iter_data_by_time(news_db, news_rows):
+    path = news_db(news_rows(0, 250))
+    with DBWrapper(path) as db:
+        table_name = "yahoo_news"
+        start = 1526196605 + 10
+        end = 1526196605 + 200
+        rows = list(db.iter_data_by_time(table_name, start, end))
+        assert rows == db.get_data_by_time(table_name, start, end)
+        assert len(rows) == 190
+
+        batches = list(db.iter_data_by_time(table_name, start, end,
+                                            attr_list=["title"],
+                                            batch_size=64))
+        assert [len(b) for b in batches] == [64, 64, 62]
+        assert batches[0][0] == ["title 10"]
+
+
+def test_iter_data_from_attr(news_db, news_rows):
+    path = news_db(news_rows(0, 250))
+    with DBWrapper(path) as db:
+        table_name = "yahoo_news"
+        attr_list = ["id", "pubDate"]
+        rows = db.iter_data_from_attr(table_name, attr_list)
+        # interleaving other queries must not disturb the generator
+        first = next(rows)
+        db.get_table_attrs_list(table_name)
+        rest = list(rows)
+        assert [first] + rest == db.get_data_from_attr(table_name,
+                                                       attr_list)
+
+
+def main():
+    # the tests take their db from the fixtures in conftest.py
+    pytest.main([__file__])
+
+
+if __name__ == '__main__':
+    main()
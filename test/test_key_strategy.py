@@ -0,0 +1,63 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import pytest
+
+from modules.db_wrapper import DBWrapper, blake2b_key
+
+
+def test_blake2b_key_is_rowid(news_db, news_rows):
+    path = news_db(news_rows(0, 100), key="blake2b")
+    with DBWrapper(path, key="blake2b") as db:
+        table_name = "yahoo_news"
+        attr_list = ["title", "description", "link", "pubDate", "allNews"]
+        db.data_insert(table_name, attr_list, news_rows(0, 120))
+
+        data_list = db.get_data_from_attr(table_name, ["id", "rowid",
+                                                       "title"])
+        assert len(data_list) == 120
+        for key, rowid, title in data_list:
+            assert key == rowid == blake2b_key(title)
+
+
+def test_seen_ids_drop_duplicates(news_db, news_rows):
+    path = news_db(news_rows(0, 100), key="blake2b")
+    table_name = "yahoo_news"
+    attr_list = ["title", "description", "link", "pubDate", "allNews"]
+    with DBWrapper(path, key="blake2b", seen_ids=True) as db:
+        rows = news_rows(0, 150)
+        # the ids already in the table are read on the first insert
+        result = db.bulk_insert(table_name, attr_list, rows + rows)
+        assert result["rows"] == 300
+        assert result["inserted"] == 50
+        assert len(db._seen_ids(table_name)) == 150
+        assert len(db.get_data_from_attr(table_name, ["id"])) == 150
+
+
+def test_fts_index_with_blake2b_key(news_db, news_rows):
+    path = news_db(news_rows(0, 100), key="blake2b")
+    with DBWrapper(path, key="blake2b") as db:
+        table_name = "yahoo_news"
+        attr_list = ["title", "description", "link", "pubDate", "allNews"]
+        db.create_fts_index(table_name)
+        db.data_insert(table_name, attr_list, news_rows(0, 200))
+
+        start = 1526196605
+        end = start + 200
+        count = db.get_count_query_by_time(table_name, ["金融"],
+                                           start, end)
+        assert count == 200
+        assert db.get_count_query_by_time(table_name, ["金融"], start,
+                                          end, use_fts=True) == count
+        db._cursor.execute("SELECT count(*) FROM yahoo_news_fts")
+        assert db._cursor.fetchone()[0] == 200
+
+
+def main():
+    # the tests take their db from the fixtures in conftest.py
+    pytest.main([__file__])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import tempfile
+from email.utils import formatdate
+
+from modules.db_wrapper import DBWrapper, rss_time_to_timestamp
+
+
+def make_rss_news_db(path, num=250):
+    # pubDate as crawled from the rss feed, before it was made a number
+    with DBWrapper(path) as db:
+        table_name = "yahoo_news"
+        attr_list = ["title", "description", "link", "pubDate", "allNews"]
+        db.create_table(table_name, attr_list)
+        values_list = [["title {}".format(i), "desc", "link",
+                        formatdate(1526196605 + i * 60, usegmt=True), "news"]
+                       for i in range(num)]
+        db.data_insert(table_name, attr_list, values_list)
+
+
+def test_convert_column():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        make_rss_news_db(path)
+        with DBWrapper(path) as db:
+            table_name = "yahoo_news"
+            progress = list()
+            result = db.convert_column(
+                    table_name, "pubDate", rss_time_to_timestamp,
+                    batch_rows=100,
+                    progress=lambda done, total: progress.append(done))
+            assert result["rows"] == result["changed"] == 250
+            assert progress == [100, 200, 250]
+            data_list = db.get_data_by_time(table_name, 1526196605,
+                                            1526196605 + 60 * 10)
+            assert len(data_list) == 10
+
+            # converted values are left as they are
+            assert db.convert_column(table_name, "pubDate",
+                                     rss_time_to_timestamp)["changed"] == 0
+
+            db.convert_column(table_name, "pubDate",
+                              sql="pubDate - pubDate % 3600")
+            values = db.get_data_from_attr(table_name, ["pubDate"])
+            assert all(v[0] % 3600 == 0 for v in values)
+
+
+def test_migrate():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        make_rss_news_db(path)
+        steps = [
+            (2, "CREATE INDEX IF NOT EXISTS idx_yahoo_news_link "
+                "ON yahoo_news (link)"),
+            (1, lambda db: db.convert_column(
+                    "yahoo_news", "pubDate", rss_time_to_timestamp)),
+        ]
+        with DBWrapper(path) as db:
+            assert db.get_schema_version() == 0
+            assert db.migrate(steps) == 2
+            values = db.get_data_from_attr("yahoo_news", ["pubDate"])
+            assert all(isinstance(v[0], int) for v in values)
+
+        called = list()
+        steps.append((3, lambda db: called.append(3)))
+        steps.append((4, "CREATE INDEX broken ON no_such_table (x)"))
+        with DBWrapper(path) as db:
+            # only the new steps run, the failing one is not recorded
+            assert db.migrate(steps) == 3
+            assert called == [3]
+            assert db.get_schema_version() == 3
+
+
+def test_migrate_failed_function_step():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        make_rss_news_db(path, num=30)
+        steps = [(1, lambda db: db.convert_column(
+                         "yahoo_new", "pubDate", rss_time_to_timestamp))]
+        with DBWrapper(path) as db:
+            assert db.migrate(steps) == 0
+            assert db.get_schema_version() == 0
+
+        def convert(value):
+            # the 16th row, in the second batch
+            if value == formatdate(1526196605 + 15 * 60, usegmt=True):
+                raise ValueError(value)
+            return rss_time_to_timestamp(value)
+
+        steps = [(1, lambda db: db.convert_column(
+                         "yahoo_news", "pubDate", convert, batch_rows=10))]
+        with DBWrapper(path) as db:
+            try:
+                db.migrate(steps)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("the failing step was not raised")
+        with DBWrapper(path) as db:
+            assert db.get_schema_version() == 0
+            # the batch that failed was rolled back, not committed on exit
+            values = [v[0] for v in db.get_data_from_attr("yahoo_news",
+                                                           ["pubDate"])]
+            assert sum(isinstance(v, int) for v in values) == 10
+
+
+def main():
+    test_convert_column()
+    test_migrate()
+    test_migrate_failed_function_step()
+
+
+if __name__ == '__main__':
+    main()
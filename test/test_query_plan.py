@@ -0,0 +1,68 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import sqlite3
+import tempfile
+
+from modules.db_wrapper import DBWrapper
+
+
+def test_range_query_uses_time_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        with DBWrapper(os.path.join(tmp, "news.db")) as db:
+            table_name = "yahoo_news"
+            attr_list = ["title", "description", "link", "pubDate", "allNews"]
+            db.create_table(table_name, attr_list,
+                            attr_types={"pubDate": "INTEGER"})
+            values_list = [["title {}".format(i), "desc", "link",
+                            1526196605 + i, "news"] for i in range(100)]
+            db.data_insert(table_name, attr_list, values_list)
+
+            plan = db.get_query_plan_by_time(table_name, 1526196605,
+                                             1526196705)
+            assert any("USING INDEX idx_yahoo_news_pubDate" in detail
+                       or "USING COVERING INDEX idx_yahoo_news_pubDate"
+                       in detail for detail in plan), plan
+
+            # numbers passed as strings still compare as numbers
+            data_list = db.get_data_by_time(table_name, "1526196615",
+                                            "1526196625")
+            assert [d[4] for d in data_list] == list(range(1526196615,
+                                                           1526196625))
+
+
+def test_index_added_to_existing_table():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE yahoo_news (id PRIMARY KEY, title, "
+                     "pubDate)")
+        conn.execute("INSERT INTO yahoo_news VALUES ('a', 'Hello', 10)")
+        conn.commit()
+        conn.close()
+
+        with DBWrapper(path) as db:
+            assert db.get_data_by_time("yahoo_news", 5, 15) == \
+                [["a", "Hello", 10]]
+            # reads never change the schema
+            plan = db.get_query_plan_by_time("yahoo_news", 5, 15)
+            assert not any("idx_yahoo_news_pubDate" in detail
+                           for detail in plan), plan
+
+            assert db.migrate([(1, "CREATE INDEX IF NOT EXISTS "
+                                   "idx_yahoo_news_pubDate ON yahoo_news "
+                                   "(pubDate)")]) == 1
+            plan = db.get_query_plan_by_time("yahoo_news", 5, 15)
+            assert any("idx_yahoo_news_pubDate" in detail
+                       for detail in plan), plan
+
+
+def main():
+    test_range_query_uses_time_index()
+    test_index_added_to_existing_table()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import asyncio
+import threading
+import time
+
+from stockretriever import AsyncStockRetriever, QueryError, QuoteBatcher
+
+
+class FakeRetriever(object):
+    """get_current_info answering like YQL, recording every query"""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = list()
+        self.lock = threading.Lock()
+
+    def get_current_info(self, symbolList, columnsToRetrieve='*'):
+        with self.lock:
+            self.queries.append((list(symbolList), columnsToRetrieve))
+        time.sleep(self.delay)
+        if "BOOM" in symbolList:
+            raise QueryError("YQL query failed")
+        quotes = [{"symbol": s.upper(), "LastTradePriceOnly": str(len(s))}
+                  for s in symbolList if s != "NONE"]
+        # a single quote comes back without the list around it
+        return quotes[0] if len(quotes) == 1 else quotes
+
+
+def test_concurrent_calls_are_batched():
+    retriever = FakeRetriever()
+    batcher = QuoteBatcher(retriever, max_batch_size=10, wait=0.2)
+    symbols = ["s{}".format(i) for i in range(25)] + ["S1"]
+    results = dict()
+
+    def ask(symbol):
+        results[symbol] = batcher.get_current_info(symbol)
+
+    threads = [threading.Thread(target=ask, args=(s, )) for s in symbols]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(results[s]["symbol"] == s.upper() for s in symbols)
+    assert 3 <= len(retriever.queries) <= 4
+    assert all(len(q[0]) <= 10 for q in retriever.queries)
+    assert batcher.queries == len(retriever.queries)
+
+
+def test_missing_symbols_and_errors():
+    batcher = QuoteBatcher(FakeRetriever(), wait=0.01)
+    none = batcher.submit("NONE")
+    single = batcher.submit("yhoo", ["LastTradePriceOnly"])
+    assert batcher.get_current_info("goog")["LastTradePriceOnly"] == "4"
+    assert single.result()["symbol"] == "YHOO"
+    assert isinstance(none.exception(), QueryError)
+
+    futures = [batcher.submit(s) for s in ["aapl", "BOOM"]]
+    assert all(isinstance(f.exception(), QueryError) for f in futures)
+
+    quotes = batcher.get_many(["s{}".format(i) for i in range(120)])
+    assert [q["symbol"] for q in quotes] == \
+        ["S{}".format(i) for i in range(120)]
+
+
+def test_async_get_quote():
+    retriever = FakeRetriever(delay=0.05)
+
+    async def fetch():
+        async with AsyncStockRetriever() as stocks:
+            stocks._batcher.retriever = retriever
+            return await asyncio.gather(
+                *[stocks.get_quote("s{}".format(i)) for i in range(40)])
+
+    quotes = asyncio.run(fetch())
+    assert [q["symbol"] for q in quotes] == \
+        ["S{}".format(i) for i in range(40)]
+    assert len(retriever.queries) == 1
+
+
+def main():
+    test_concurrent_calls_are_batched()
+    test_missing_symbols_and_errors()
+    test_async_get_quote()
+
+
+if __name__ == '__main__':
+    main()
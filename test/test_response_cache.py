@@ -0,0 +1,152 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from response_cache import (
+    MemoryCache,
+    ResponseCache,
+    SQLiteCache,
+    yql_table,
+)
+from stockretriever import StockRetriever
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1526196605.0
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream(object):
+    """fetch function counting its calls"""
+    def __init__(self):
+        self.calls = list()
+        self.event = threading.Event()
+
+    def __call__(self, yql):
+        self.calls.append(yql)
+        self.event.set()
+        return 200, body(len(self.calls))
+
+
+def body(n):
+    return json.dumps({"query": {"results": {"n": n}}})
+
+
+def test_ttl_per_table():
+    clock = Clock()
+    upstream = Upstream()
+    cache = ResponseCache(MemoryCache(), clock=clock)
+    quotes = 'select * from yahoo.finance.quotes where symbol in ("YHOO")'
+    sectors = "select * from yahoo.finance.sectors"
+    assert yql_table(quotes) == "yahoo.finance.quotes"
+
+    assert cache.fetch(quotes, upstream) == body(1)
+    assert cache.fetch(sectors, upstream) == body(2)
+    clock.now += 59
+    # spacing does not matter
+    assert cache.fetch(quotes.replace(" ", "  "), upstream) == body(1)
+    clock.now += 2
+    assert cache.fetch(quotes, upstream) == body(3)
+    assert cache.fetch(sectors, upstream) == body(2)
+    assert cache.stats() == {"hits": 2, "stale_hits": 0, "misses": 3,
+                             "refresh_errors": 0, "hit_rate": 0.4}
+
+
+def test_stale_while_revalidate():
+    clock = Clock()
+    upstream = Upstream()
+    cache = ResponseCache(MemoryCache(), ttls={}, default_ttl=10,
+                          stale_ttl=30, clock=clock)
+    yql = "select * from rss where url='x'"
+    cache.fetch(yql, upstream)
+    upstream.event.clear()
+    clock.now += 20
+    # the old response right away, the new one fetched in the background
+    assert cache.fetch(yql, upstream) == body(1)
+    assert upstream.event.wait(5)
+    for _ in range(500):
+        if cache.backend.get(yql)[0] == body(2):
+            break
+        time.sleep(0.01)
+    assert cache.fetch(yql, upstream) == body(2)
+    assert cache.stats()["stale_hits"] == 1
+    assert len(upstream.calls) == 2
+
+
+def test_lru_and_errors_not_kept():
+    cache = ResponseCache(MemoryCache(maxsize=2))
+    upstream = Upstream()
+    for symbol in ["a", "b", "c", "a"]:
+        cache.fetch("select * from rss where url='{}'".format(symbol),
+                    upstream)
+    assert len(upstream.calls) == 4
+    assert len(cache.backend) == 2
+
+    cache.fetch("select * from rss where url='bad'",
+                lambda yql: (400, '{"error": {"description": "bad"}}'))
+    assert cache.backend.get("select * from rss where url='bad'") is None
+
+    # no results, or an error, even with status 200
+    for text in ['{"query": {"count": 0, "results": null}}',
+                 '{"error": {"description": "no such table"}}',
+                 "<html></html>"]:
+        cache.fetch("select * from rss where url='empty'",
+                    lambda yql: (200, text))
+        assert cache.backend.get("select * from rss where url='empty'") \
+            is None
+
+
+def test_sqlite_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "yql_cache.db")
+        upstream = Upstream()
+        yql = "select * from yahoo.finance.industry where id ='112'"
+        backend = SQLiteCache(path)
+        ResponseCache(backend).fetch(yql, upstream)
+        backend.close()
+
+        # kept across processes
+        backend = SQLiteCache(path)
+        cache = ResponseCache(backend)
+        assert cache.fetch(yql, upstream) == body(1)
+        assert cache.stats()["hit_rate"] == 1.0
+        backend.prune(older_than=float("inf"))
+        assert len(backend) == 0
+        backend.close()
+
+
+def test_retriever_with_cache():
+    upstream = Upstream()
+    body = {"query": {"results": {"sector": [{"name": "Basic Materials"}]}}}
+
+    def fetch(yql):
+        upstream(yql)
+        return 200, json.dumps(body)
+
+    stocks = StockRetriever(cache=ResponseCache())
+    # in place of the network
+    stocks._fetch = fetch
+    for _ in range(3):
+        assert stocks.get_industry_ids() == [{"name": "Basic Materials"}]
+    assert len(upstream.calls) == 1
+
+
+def main():
+    test_ttl_per_table()
+    test_stale_while_revalidate()
+    test_lru_and_errors_not_kept()
+    test_sqlite_cache()
+    test_retriever_with_cache()
+
+
+if __name__ == '__main__':
+    main()
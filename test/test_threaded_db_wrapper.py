@@ -0,0 +1,104 @@
+#! /usr/local/bin/python3
+"""
+.. moduleauthor:: Ping-Lin <billy3962@hotmail.com>
+"""
+import os
+import tempfile
+import threading
+
+from modules.db_wrapper import ThreadedDBWrapper
+
+
+def test_concurrent_insert_and_read():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "news.db")
+        table_name = "yahoo_news"
+        attr_list = ["title", "description", "pubDate"]
+        errors = list()
+        counts = list()
+
+        with ThreadedDBWrapper(path, batch_rows=100) as db:
+            db.create_table(table_name, attr_list)
+
+            def crawl(n):
+                try:
+                    for i in range(20):
+                        db.data_insert(table_name, attr_list,
+                                       [["title {} {} {}".format(n, i, j),
+                                         "desc", n * 1000 + i * 10 + j]
+                                        for j in range(10)])
+                except Exception as e:
+                    errors.append(e)
+
+            def read():
+                try:
+                    for _ in range(20):
+                        rows = db.get_data_by_time(table_name, 0, 10 ** 6)
+                        counts.append(len(rows))
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=crawl, args=(n, ))
+                       for n in range(8)]
+            threads += [threading.Thread(target=read) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            db.flush()
+
+            assert not errors, errors
+            assert all(0 <= c <= 1600 for c in counts)
+            assert len(db.get_data_from_attr(table_name, ["id"])) == 1600
+
+            db._cursor.execute("PRAGMA journal_mode")
+            assert db._cursor.fetchone()[0] == "wal"
+
+        # rows still queued at exit are written before the db is closed
+        with ThreadedDBWrapper(path) as db:
+            db.data_insert(table_name, attr_list, [["late", "desc", 0]])
+        with ThreadedDBWrapper(path) as db:
+            assert len(db.get_data_from_attr(table_name, ["id"])) == 1601
+
+
+def test_connection_per_thread():
+    with tempfile.TemporaryDirectory() as tmp:
+        with ThreadedDBWrapper(os.path.join(tmp, "news.db")) as db:
+            conns = list()
+            thread = threading.Thread(target=lambda: conns.append(db._conn))
+            thread.start()
+            thread.join()
+            assert conns[0] is not db._conn
+            assert db._conn is db._conn
+
+
+def test_bad_row_keeps_writer_alive():
+    with tempfile.TemporaryDirectory() as tmp:
+        table_name = "yahoo_news"
+        attr_list = ["title", "pubDate"]
+        with ThreadedDBWrapper(os.path.join(tmp, "news.db"),
+                               seen_ids=True) as db:
+            db.create_table(table_name, attr_list)
+            db.data_insert(table_name, attr_list, [["a", 1]])
+            # no title to make the id from
+            db.data_insert(table_name, attr_list, [["b", 2], [None, 3]])
+            db.data_insert(table_name, attr_list, [["c", 4]])
+            db.flush()
+            assert sorted(r[0] for r in db.get_data_from_attr(
+                          table_name, ["title"])) == ["a", "c"]
+
+            # the failed call can be made again once fixed
+            db.data_insert(table_name, attr_list, [["b", 2]])
+            db.flush()
+            assert len(db.get_data_from_attr(table_name, ["id"])) == 3
+            assert db._writer.is_alive()
+
+
+def main():
+    test_concurrent_insert_and_read()
+    test_connection_per_thread()
+    test_bad_row_keeps_writer_alive()
+
+
+if __name__ == '__main__':
+    main()